@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from app.db.database import database_pool_stats
+from app.db.replicas import replica_pool_stats
+from app.cache.redis import cache_pool_stats
+
+router = APIRouter()
+
+@router.get("/pools")
+def read_pool_stats():
+    # Operational detail, kept off the public proxy like /metrics
+    return {
+        "database": {**database_pool_stats(), **replica_pool_stats()},
+        "redis": cache_pool_stats(),
+    }
@@ -1,125 +1,393 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import hashlib
+from datetime import datetime
+import orjson
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
 from app.db.database import get_db
 from app.models.user import User
 from app.models.post import Post
-from app.schemas.post import PostCreate, PostUpdate, Post as PostSchema
+from app.schemas.post import PostCreate, PostUpdate, Post as PostSchema, PostPage
 from app.core.dependencies import get_current_user
-from app.cache.redis import get_cache, set_cache, invalidate_cache
+from app.core.http_cache import (
+    CachedResponse, build_response, etag_for, generation_etag, parse_timestamp,
+    is_not_modified, not_modified
+)
+from app.core.pagination import encode_cursor, decode_cursor, encode_offset_cursor, decode_offset_cursor
+from app.db.replicas import get_read_db, get_user_read_db, mark_write, replay_after_lag
+from app.db.search import search_posts_query
+from app.db.outbox import apply_committed_operations, dispatch_outbox, enqueue_cache_operations
+from app.db.recent_posts import index_operations, post_score, score_created_at
+from app.cache.redis import (
+    get_or_set_raw, get_many_cache_raw, set_many_cache_raw,
+    get_generation, versioned_key, record_view, most_viewed, recent_posts_page
+)
+
+MAX_BATCH_SIZE = 100
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_LINE = 1024 * 1024
 
 router = APIRouter()
 
-@router.post("/", response_model=PostSchema, status_code=status.HTTP_201_CREATED)
-def create_post(post: PostCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_post = Post(title=post.title, content=post.content, author_id=current_user.id)
-    db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
-    
-    # Invalidate cache for all posts and user posts
-    invalidate_cache("all_posts")
-    invalidate_cache(f"user_posts:{current_user.id}")
-    
-    return db_post
+def dump_post(post: Post) -> dict:
+    return PostSchema.model_validate(post).model_dump(mode="json")
 
-@router.get("/", response_model=List[PostSchema])
-def read_posts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    cache_key = f"all_posts:{skip}:{limit}"
-    cached_posts = get_cache(cache_key)
-    
-    if cached_posts:
-        return cached_posts
-    
-    posts = db.query(Post).offset(skip).limit(limit).all()
-    
-    # Convert posts to dict for caching using model_validate
-    posts_data = [PostSchema.model_validate(post).model_dump() for post in posts]
-    set_cache(cache_key, posts_data)
-    
-    return posts
-
-@router.get("/me", response_model=List[PostSchema])
-def read_user_posts(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    cache_key = f"user_posts:{current_user.id}"
-    cached_posts = get_cache(cache_key)
-    
-    if cached_posts:
-        return cached_posts
-    
-    posts = db.query(Post).filter(Post.author_id == current_user.id).all()
-    
-    # Convert posts to dict for caching using model_validate
-    posts_data = [PostSchema.model_validate(post).model_dump() for post in posts]
-    set_cache(cache_key, posts_data)
-    
-    return posts
+def post_response(post: Post) -> CachedResponse:
+    return build_response(dump_post(post), last_modified=parse_timestamp(post.updated_at))
 
-@router.get("/{post_id}", response_model=PostSchema)
-def read_post(post_id: int, db: Session = Depends(get_db)):
-    cache_key = f"post:{post_id}"
-    cached_post = get_cache(cache_key)
-    
-    if cached_post:
-        return cached_post
-    
-    post = db.query(Post).filter(Post.id == post_id).first()
+async def paginate(db: AsyncSession, query, cursor: Optional[str], limit: int):
+    # Keyset pagination over (created_at, id), newest first
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                Post.created_at < created_at,
+                and_(Post.created_at == created_at, Post.id < post_id),
+            )
+        )
+
+    query = query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1)
+    posts = (await db.execute(query)).scalars().all()
+
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor(posts[-1].created_at, posts[-1].id)
+
+    return {"items": [dump_post(post) for post in posts], "next_cursor": next_cursor}
+
+def listing_operations(author_id: int) -> List[list]:
+    # Invalidate every cached listing page for all posts and user posts
+    return [["bump", "all_posts"], ["bump", f"user_posts:{author_id}"]]
+
+async def commit_with_cache_operations(db: AsyncSession, background_tasks: BackgroundTasks, operations: List[list]):
+    # Queued in the write's transaction and applied as soon as it commits, so
+    # the writer's next read already sees it. The outbox row is cleared after
+    # the response; the periodic dispatcher retries anything left behind
+    enqueue_cache_operations(db, operations)
+    await db.commit()
+    await run_in_threadpool(apply_committed_operations, operations)
+    replay_after_lag(operations)
+    if not any(task.func is dispatch_outbox for task in background_tasks.tasks):
+        background_tasks.add_task(dispatch_outbox, db)
+
+def parse_ids(ids: str) -> List[int]:
+    try:
+        post_ids = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if len(post_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} ids per request")
+    return post_ids
+
+async def load_post_bodies(db: AsyncSession, post_ids: List[int]) -> Dict[int, bytes]:
+    cached = await run_in_threadpool(get_many_cache_raw, [f"post:{post_id}" for post_id in post_ids])
+    bodies = {
+        post_id: CachedResponse.unpack(cached[f"post:{post_id}"]).body
+        for post_id in post_ids
+        if f"post:{post_id}" in cached
+    }
+
+    # One IN query for every miss
+    missing = [post_id for post_id in post_ids if post_id not in bodies]
+    if missing:
+        posts = (await db.execute(select(Post).where(Post.id.in_(missing)))).scalars().all()
+        fetched = {post.id: post_response(post) for post in posts}
+        if fetched:
+            await run_in_threadpool(set_many_cache_raw, {f"post:{post_id}": entry.pack() for post_id, entry in fetched.items()})
+        bodies.update((post_id, entry.body) for post_id, entry in fetched.items())
+    return bodies
+
+def page_body(bodies: Dict[int, bytes], post_ids: List[int], next_cursor: Optional[str]) -> bytes:
+    # Splice the cached bodies together instead of decoding them
+    items = b",".join(bodies[post_id] for post_id in post_ids if post_id in bodies)
+    return b'{"items":[' + items + b'],"next_cursor":' + orjson.dumps(next_cursor) + b"}"
+
+async def read_posts_by_id(db: AsyncSession, post_ids: List[int]) -> CachedResponse:
+    body = page_body(await load_post_bodies(db, post_ids), post_ids, None)
+    return CachedResponse(body, etag_for(body))
+
+async def read_recent_page(db: AsyncSession, cursor: Optional[str], limit: int, etag: str) -> Optional[CachedResponse]:
+    # Page ids come from the Redis index, bodies from the per-post cache;
+    # None while the index is not ready
+    after = None
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        after = (post_score(created_at), post_id)
+    entries = await run_in_threadpool(recent_posts_page, after, limit + 1)
+    if entries is None:
+        return None
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(score_created_at(entries[-1][1]), entries[-1][0])
+
+    post_ids = [post_id for post_id, _ in entries]
+    return CachedResponse(page_body(await load_post_bodies(db, post_ids), post_ids, next_cursor), etag)
+
+async def iter_lines(request: Request):
+    # Split the request body into NDJSON lines without buffering all of it
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_IMPORT_LINE:
+            raise HTTPException(status_code=413, detail=f"Lines are limited to {MAX_IMPORT_LINE} bytes")
+        for line in lines:
+            yield line
+    yield buffer
+
+async def get_post_or_404(db: AsyncSession, post_id: int) -> Post:
+    post = await db.get(Post, post_id)
     if post is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    
-    # Convert post to dict for caching using model_validate
-    post_data = PostSchema.model_validate(post).model_dump()
-    set_cache(cache_key, post_data)
-    
     return post
 
+@router.post("/", response_model=PostSchema, status_code=status.HTTP_201_CREATED)
+async def create_post(
+    post: PostCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # INSERT ... RETURNING hands back the server-side defaults in one round trip
+    db_post = await db.scalar(
+        insert(Post).values(title=post.title, content=post.content, author_id=current_user.id).returning(Post)
+    )
+    await commit_with_cache_operations(db, background_tasks, [*index_operations([db_post]), *listing_operations(current_user.id)])
+    await mark_write(current_user)
+
+    return db_post
+
+@router.post("/batch", response_model=List[PostSchema], status_code=status.HTTP_201_CREATED)
+async def create_posts(
+    background_tasks: BackgroundTasks,
+    posts: List[PostCreate] = Body(..., min_length=1, max_length=MAX_BATCH_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # A single multi-row INSERT ... RETURNING in one transaction, rows in input order
+    result = await db.scalars(
+        insert(Post).returning(Post, sort_by_parameter_order=True),
+        [{"title": post.title, "content": post.content, "author_id": current_user.id} for post in posts],
+    )
+    db_posts = result.all()
+    await commit_with_cache_operations(db, background_tasks, [*index_operations(db_posts), *listing_operations(current_user.id)])
+    await mark_write(current_user)
+
+    return db_posts
+
+@router.get("/", response_model=PostPage)
+async def read_posts(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=100),
+    ids: Optional[str] = Query(None, description="Comma-separated post ids to fetch instead of a page"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if ids is not None:
+        return (await read_posts_by_id(db, parse_ids(ids))).respond(request)
+
+    # Unchanged listings are answered from the generation alone
+    etag = generation_etag("all_posts", await run_in_threadpool(get_generation, "all_posts"), cursor or "", limit)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    page = await read_recent_page(db, cursor, limit, etag)
+    if page is not None:
+        return page.respond(request)
+
+    async def load_page():
+        return build_response(await paginate(db, select(Post), cursor, limit), etag=etag).pack()
+
+    key = await run_in_threadpool(versioned_key, "all_posts", cursor or "", limit)
+    page = await get_or_set_raw(key, load_page)
+    return CachedResponse.unpack(page).respond(request)
+
+@router.get("/me", response_model=PostPage)
+async def read_user_posts(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_user_read_db)
+):
+    namespace = f"user_posts:{current_user.id}"
+    etag = generation_etag(namespace, await run_in_threadpool(get_generation, namespace), cursor or "", limit)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    async def load_page():
+        query = select(Post).where(Post.author_id == current_user.id)
+        return build_response(await paginate(db, query, cursor, limit), etag=etag).pack()
+
+    key = await run_in_threadpool(versioned_key, namespace, cursor or "", limit)
+    page = await get_or_set_raw(key, load_page)
+    return CachedResponse.unpack(page).respond(request)
+
+@router.get("/search", response_model=PostPage)
+async def search_posts(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    query_hash = hashlib.sha1(q.encode()).hexdigest()
+    async def load_page():
+        # Ranked matches come straight from the GIN / FTS5 index
+        query = search_posts_query(db.get_bind().dialect.name, q, limit + 1, offset)
+        posts = (await db.execute(query)).scalars().all()
+
+        next_cursor = None
+        if len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_offset_cursor(offset + limit)
+
+        return build_response({"items": [dump_post(post) for post in posts], "next_cursor": next_cursor}).pack()
+
+    key = await run_in_threadpool(versioned_key, "all_posts", "search", query_hash, offset, limit)
+    page = await get_or_set_raw(key, load_page)
+    return CachedResponse.unpack(page).respond(request)
+
+@router.get("/popular", response_model=PostPage)
+async def read_popular_posts(
+    request: Request,
+    limit: int = Query(10, ge=1, le=MAX_BATCH_SIZE),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Ranked straight from the Redis sorted set, bodies from the post cache
+    return (await read_posts_by_id(db, await run_in_threadpool(most_viewed, limit))).respond(request)
+
+@router.get("/export")
+async def export_posts(
+    author_id: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    query = select(Post).order_by(Post.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    if author_id is not None:
+        query = query.where(Post.author_id == author_id)
+    if created_after is not None:
+        query = query.where(Post.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(Post.created_at < created_before)
+
+    async def generate():
+        # Rows arrive from a server-side cursor EXPORT_BATCH_SIZE at a time
+        result = await db.stream(query)
+        async for posts in result.scalars().partitions():
+            yield b"".join(orjson.dumps(dump_post(post)) + b"\n" for post in posts)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.post("/import")
+async def import_posts(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    imported = 0
+    batch = []
+
+    async def flush():
+        nonlocal imported
+        rows = (await db.execute(insert(Post).returning(Post.id, Post.created_at), batch)).all()
+        await commit_with_cache_operations(db, background_tasks, [*index_operations(rows), *listing_operations(current_user.id)])
+        imported += len(batch)
+        batch.clear()
+
+    try:
+        line_number = 0
+        async for line in iter_lines(request):
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                post = PostCreate.model_validate_json(line)
+            except ValidationError as exc:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Invalid post on line {line_number}: {exc.errors()[0]['msg']}; "
+                           f"{imported} posts before it were imported",
+                )
+            batch.append({"title": post.title, "content": post.content, "author_id": current_user.id})
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+    except HTTPException:
+        # Error responses skip background tasks; clear the committed batches' outbox rows now
+        if imported:
+            await dispatch_outbox(db)
+        raise
+    finally:
+        if imported:
+            await mark_write(current_user)
+
+    return {"imported": imported}
+
+@router.get("/{post_id}", response_model=PostSchema)
+async def read_post(post_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def load_post():
+        return post_response(await get_post_or_404(db, post_id)).pack()
+
+    # Cache hits are sent as stored: no pydantic, no JSON round-trip
+    post = await get_or_set_raw(f"post:{post_id}", load_post)
+    await run_in_threadpool(record_view, post_id)
+    return CachedResponse.unpack(post).respond(request)
+
 @router.put("/{post_id}", response_model=PostSchema)
-def update_post(
-    post_id: int, 
-    post_update: PostUpdate, 
-    db: Session = Depends(get_db),
+async def update_post(
+    post_id: int,
+    post_update: PostUpdate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_post = db.query(Post).filter(Post.id == post_id).first()
-    if db_post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
+    db_post = await get_post_or_404(db, post_id)
+
     if db_post.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this post")
-    
+
     # Update post fields if provided
     for key, value in post_update.model_dump(exclude_unset=True).items():
         setattr(db_post, key, value)
-    
-    db.commit()
-    db.refresh(db_post)
-    
-    # Invalidate cache
-    invalidate_cache(f"post:{post_id}")
-    invalidate_cache("all_posts")
-    invalidate_cache(f"user_posts:{current_user.id}")
-    
+
+    await commit_with_cache_operations(db, background_tasks, [["invalidate", f"post:{post_id}"], *listing_operations(current_user.id)])
+    await db.refresh(db_post)
+    await mark_write(current_user)
+
     return db_post
 
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_post(
-    post_id: int, 
-    db: Session = Depends(get_db),
+async def delete_post(
+    post_id: int,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_post = db.query(Post).filter(Post.id == post_id).first()
-    if db_post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
+    db_post = await get_post_or_404(db, post_id)
+
     if db_post.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this post")
-    
-    db.delete(db_post)
-    db.commit()
-    
-    # Invalidate cache
-    invalidate_cache(f"post:{post_id}")
-    invalidate_cache("all_posts")
-    invalidate_cache(f"user_posts:{current_user.id}")
-    
-    return None 
\ No newline at end of file
+
+    await db.delete(db_post)
+    await commit_with_cache_operations(db, background_tasks, [
+        ["invalidate", f"post:{post_id}"],
+        ["unindex", post_id],
+        ["forget_views", post_id],
+        *listing_operations(current_user.id),
+    ])
+    await mark_write(current_user)
+
+    return None
@@ -1,21 +1,523 @@
+import asyncio
 import json
-from redis import Redis
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from redis import Redis, RedisError
+from redis.exceptions import LockError
 from app.core.config import settings
+from app.cache.local import LocalCache
+from app.core.metrics import CACHE_EVICTIONS, CACHE_REQUESTS
+from app.core.pools import TimedBlockingConnectionPool, redis_pool_stats
 
-redis_client = Redis.from_url(settings.REDIS_URL)
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Views not yet written to the database (post id -> count), the batch
+# currently being written, and running totals for the popular listing
+VIEW_DELTAS_KEY = "views:pending"
+VIEW_FLUSHING_KEY = "views:flushing"
+VIEW_RANKING_KEY = "views:ranking"
+
+# Every post id scored by creation time (microseconds since the epoch), and
+# a marker set once the index holds every post. Members are zero-padded so
+# posts created in the same microsecond sort by id, like the table does
+RECENT_INDEX_KEY = "posts:recent"
+RECENT_READY_KEY = "posts:recent:ready"
+
+def redis_pool_options() -> dict:
+    return {
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "timeout": settings.REDIS_POOL_TIMEOUT,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+    }
+
+# redis-py is synchronous: async code runs these calls through
+# run_in_threadpool so a slow Redis never stalls the event loop
+redis_pool = TimedBlockingConnectionPool.from_url(settings.REDIS_URL, **redis_pool_options())
+redis_client = Redis(connection_pool=redis_pool)
+
+# Optional L1 tier; copies are dropped on every worker through pub/sub
+local_cache = (
+    LocalCache(settings.LOCAL_CACHE_MAX_ENTRIES, settings.LOCAL_CACHE_TTL, on_evict=CACHE_EVICTIONS.inc)
+    if settings.LOCAL_CACHE_ENABLED
+    else None
+)
+
+# Continuously refilled token buckets. One call takes a token from every
+# bucket or from none, and returns 0 or the milliseconds until it could
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(bucket[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(bucket[2]) or now))
+    available = math.min(capacity, available + elapsed * rate)
+    if available < 1 then
+        wait = math.max(wait, math.ceil((1 - available) / rate))
+    end
+    tokens[i] = available
+end
+if wait > 0 then
+    return wait
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', tostring(tokens[i] - 1), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate))
+end
+return 0
+"""
+_token_bucket = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+# One keyset page of the recent-posts index, newest first: the entries after
+# (ARGV[1] score, ARGV[2] member), or from the top when ARGV[1] is empty.
+# Returns nil while the index is being (re)built
+RECENT_PAGE_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return false
+end
+local start = 0
+if ARGV[1] ~= '' then
+    start = redis.call('ZCOUNT', KEYS[1], '(' .. ARGV[1], '+inf')
+    for _, member in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[1])) do
+        if member >= ARGV[2] then
+            start = start + 1
+        end
+    end
+end
+return redis.call('ZREVRANGE', KEYS[1], start, start + tonumber(ARGV[3]) - 1, 'WITHSCORES')
+"""
+_recent_page = redis_client.register_script(RECENT_PAGE_SCRIPT)
+
+_MISSING = object()
+# Stored in place of an entry whose loader answered 404; followed by the detail
+NOT_FOUND_MARKER = b"\x00not-found\n"
+_redis_stats = {"hits": 0, "misses": 0, "errors": 0}
+_STAT_KEYS = {"hit": "hits", "miss": "misses", "error": "errors"}
+_listener = None
+_listener_lock = threading.Lock()
+
+def _handle_invalidation(message):
+    payload = json.loads(message["data"])
+    if "pattern" in payload:
+        local_cache.delete_pattern(payload["pattern"])
+    else:
+        local_cache.delete(*payload["keys"])
+
+def _ensure_listener():
+    global _listener
+    if _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            pubsub = Redis.from_url(settings.REDIS_URL).pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{INVALIDATION_CHANNEL: _handle_invalidation})
+            _listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+def close_cache():
+    # Stop the invalidation listener and drop pooled connections; both come
+    # back lazily on next use
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+    redis_pool.disconnect()
+
+def _broadcast(**payload):
+    if local_cache is not None:
+        redis_client.publish(INVALIDATION_CHANNEL, json.dumps(payload))
+
+def _record(tier: str, result: str, count: int = 1):
+    if tier == "redis":
+        _redis_stats[_STAT_KEYS[result]] += count
+    CACHE_REQUESTS.labels(tier, result).inc(count)
+
+def _local_lookup(key: str):
+    _ensure_listener()
+    value = local_cache.get(key, _MISSING)
+    _record("local", "miss" if value is _MISSING else "hit")
+    return value
+
+def _redis_read(command, *args):
+    try:
+        return command(*args)
+    except RedisError:
+        _record("redis", "error")
+        raise
 
 def get_cache(key: str):
-    data = redis_client.get(key)
+    if local_cache is not None:
+        value = _local_lookup(key)
+        if value is not _MISSING:
+            return value
+
+    data = _redis_read(redis_client.get, key)
     if data:
-        return json.loads(data)
+        _record("redis", "hit")
+        value = json.loads(data)
+        if local_cache is not None:
+            local_cache.set(key, value)
+        return value
+    _record("redis", "miss")
     return None
 
+def _jittered_ttl(expiry: int) -> int:
+    # Spread expiries so keys written together don't expire together
+    jitter = settings.CACHE_TTL_JITTER
+    return max(1, round(expiry * random.uniform(1 - jitter, 1 + jitter)))
+
+def _wrap(data: bytes, expiry: int) -> Tuple[bytes, int]:
+    # Raw entries carry their soft expiry; Redis keeps them a little longer
+    # so a stale copy can be served while one caller rebuilds it
+    ttl = _jittered_ttl(expiry)
+    return b"%.3f\n" % (time.time() + ttl) + data, ttl + settings.CACHE_STALE_TTL
+
+def _unwrap(entry: bytes) -> Tuple[bytes, float]:
+    soft_expires_at, _, data = entry.partition(b"\n")
+    return data, float(soft_expires_at)
+
+def _get_entry(key: str) -> Optional[Tuple[bytes, float]]:
+    if local_cache is not None:
+        entry = _local_lookup(key)
+        if entry is not _MISSING:
+            return _unwrap(entry)
+
+    entry = _redis_read(redis_client.get, key)
+    if entry:
+        _record("redis", "hit")
+        if local_cache is not None:
+            local_cache.set(key, entry)
+        return _unwrap(entry)
+    _record("redis", "miss")
+    return None
+
+def get_many_cache_raw(keys) -> dict:
+    # L1 first, then a single MGET for whatever is left. Remembered 404s
+    # are left out, like keys that are not cached at all
+    found = {}
+    remaining = list(keys)
+    if local_cache is not None:
+        remaining = []
+        for key in keys:
+            entry = _local_lookup(key)
+            if entry is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = _unwrap(entry)[0]
+
+    if remaining:
+        for key, entry in zip(remaining, _redis_read(redis_client.mget, remaining)):
+            if entry:
+                _record("redis", "hit")
+                found[key] = _unwrap(entry)[0]
+                if local_cache is not None:
+                    local_cache.set(key, entry)
+            else:
+                _record("redis", "miss")
+    return {key: data for key, data in found.items() if not data.startswith(NOT_FOUND_MARKER)}
+
+def _lock(name: str, timeout: float):
+    # Acquired and released from whichever threadpool thread runs the call,
+    # so the token cannot live in a thread-local
+    return redis_client.lock(name, timeout=timeout, thread_local=False)
+
+def _try_acquire(lock) -> bool:
+    return lock.acquire(blocking=False)
+
+def _release(lock):
+    try:
+        lock.release()
+    except LockError:
+        # Held past its timeout and already taken over; nothing to release
+        pass
+
+@asynccontextmanager
+async def exclusive(name: str, timeout: float):
+    """Yield True to the one worker holding lock:{name}, False to the rest."""
+    lock = _lock(f"lock:{name}", timeout)
+    acquired = await run_in_threadpool(_try_acquire, lock)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            await run_in_threadpool(_release, lock)
+
+def _found(data: bytes) -> bytes:
+    if data.startswith(NOT_FOUND_MARKER):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=data[len(NOT_FOUND_MARKER):].decode())
+    return data
+
+async def get_or_set_raw(
+    key: str,
+    loader: Callable[[], Awaitable[bytes]],
+    expiry: Optional[int] = None,
+) -> bytes:
+    """Return the cached bytes for key, rebuilding them at most once at a time.
+
+    Fresh hits are returned directly. Stale hits are served as-is unless this
+    caller wins the rebuild lock. On a miss, the lock winner runs loader while
+    everyone else waits up to CACHE_LOCK_WAIT for its result. A loader that
+    raises a 404 is remembered for CACHE_NOT_FOUND_TTL seconds, and the same
+    404 is raised to everyone asking meanwhile.
+    """
+    expiry = expiry or settings.CACHE_TTL
+    entry = await run_in_threadpool(_get_entry, key)
+    if entry is not None and entry[1] > time.time():
+        return _found(entry[0])
+
+    lock = _lock(f"lock:{key}", settings.CACHE_LOCK_TIMEOUT)
+    if await run_in_threadpool(_try_acquire, lock):
+        try:
+            try:
+                data = await loader()
+            except HTTPException as exc:
+                if exc.status_code == status.HTTP_404_NOT_FOUND:
+                    marker = NOT_FOUND_MARKER + str(exc.detail).encode()
+                    await run_in_threadpool(set_cache_raw, key, marker, settings.CACHE_NOT_FOUND_TTL)
+                raise
+            await run_in_threadpool(set_cache_raw, key, data, expiry)
+            return data
+        finally:
+            await run_in_threadpool(_release, lock)
+
+    if entry is not None:
+        return _found(entry[0])
+
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.02)
+        entry = await run_in_threadpool(_get_entry, key)
+        if entry is not None:
+            return _found(entry[0])
+
+    # The rebuild is taking too long; fall back to loading it ourselves
+    return await loader()
+
 def set_cache(key: str, value, expiry: int = 3600):
     redis_client.setex(key, expiry, json.dumps(value))
+    if local_cache is not None:
+        local_cache.set(key, value, expiry)
+
+def set_cache_raw(key: str, data: bytes, expiry: Optional[int] = None):
+    entry, ttl = _wrap(data, expiry or settings.CACHE_TTL)
+    redis_client.setex(key, ttl, entry)
+    if local_cache is not None:
+        local_cache.set(key, entry, ttl)
+
+def set_many_cache_raw(values: dict, expiry: Optional[int] = None):
+    entries = {key: _wrap(data, expiry or settings.CACHE_TTL) for key, data in values.items()}
+    pipe = redis_client.pipeline(transaction=False)
+    for key, (entry, ttl) in entries.items():
+        pipe.setex(key, ttl, entry)
+    pipe.execute()
+    if local_cache is not None:
+        for key, (entry, ttl) in entries.items():
+            local_cache.set(key, entry, ttl)
+
+def missing_keys(keys: List[str]) -> List[str]:
+    # One pipelined EXISTS per key; leaves the hit/miss stats alone
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.exists(key)
+    return [key for key, exists in zip(keys, pipe.execute()) if not exists]
 
 def invalidate_cache(key: str):
     redis_client.delete(key)
+    if local_cache is not None:
+        local_cache.delete(key)
+    _broadcast(keys=[key])
 
 def invalidate_pattern(pattern: str):
+    # Runs KEYS over the whole keyspace; keep it off the request path
     for key in redis_client.keys(pattern):
-        redis_client.delete(key) 
\ No newline at end of file
+        redis_client.delete(key)
+    if local_cache is not None:
+        local_cache.delete_pattern(pattern)
+    _broadcast(pattern=pattern)
+
+def take_tokens(buckets: Dict[str, Tuple[int, float]]) -> float:
+    """Take one token from each bucket, given as key -> (limit, window seconds).
+
+    Returns 0 when allowed, otherwise the seconds until every bucket has a
+    token again. Nothing is taken from any bucket when one of them is empty.
+    """
+    keys, args = [], [int(time.time() * 1000)]
+    for key, (limit, window) in buckets.items():
+        keys.append(f"ratelimit:{key}")
+        args += [limit, limit / (window * 1000)]
+    try:
+        wait = _token_bucket(keys=keys, args=args, client=redis_client)
+    except RedisError:
+        # Fail open: losing Redis should not lock every user out
+        return 0.0
+    return wait / 1000
+
+def record_view(post_id: int):
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hincrby(VIEW_DELTAS_KEY, post_id, 1)
+    pipe.zincrby(VIEW_RANKING_KEY, 1, post_id)
+    pipe.execute()
+
+def most_viewed(limit: int) -> List[int]:
+    return [int(post_id) for post_id in redis_client.zrevrange(VIEW_RANKING_KEY, 0, limit - 1)]
+
+def _claim_view_deltas() -> Dict[int, int]:
+    if not redis_client.exists(VIEW_FLUSHING_KEY):
+        # Only the lock holder moves the pending hash, so this cannot race
+        if not redis_client.exists(VIEW_DELTAS_KEY):
+            return {}
+        redis_client.rename(VIEW_DELTAS_KEY, VIEW_FLUSHING_KEY)
+    deltas = redis_client.hgetall(VIEW_FLUSHING_KEY)
+    return {int(post_id): int(delta) for post_id, delta in deltas.items()}
+
+@asynccontextmanager
+async def pending_view_deltas():
+    """Yield unflushed view counts as {post_id: delta}.
+
+    New views keep accumulating under a fresh key while the block runs, and
+    the yielded batch is only dropped once the block succeeds; a failed
+    batch is retried by the next flush. Yields {} while another worker is
+    flushing.
+    """
+    lock = _lock("lock:views:flush", settings.VIEW_FLUSH_LOCK_TIMEOUT)
+    if not await run_in_threadpool(_try_acquire, lock):
+        yield {}
+        return
+    try:
+        deltas = await run_in_threadpool(_claim_view_deltas)
+        yield deltas
+        if deltas:
+            await run_in_threadpool(redis_client.delete, VIEW_FLUSHING_KEY)
+    finally:
+        await run_in_threadpool(_release, lock)
+
+def _recent_member(post_id: int) -> str:
+    return f"{post_id:019d}"
+
+def add_recent_posts(scores: Dict[int, int]):
+    if scores:
+        redis_client.zadd(RECENT_INDEX_KEY, {_recent_member(post_id): score for post_id, score in scores.items()})
+
+def recent_posts_page(after: Optional[Tuple[int, int]], count: int) -> Optional[List[Tuple[int, int]]]:
+    """Up to `count` (post_id, score) pairs following the (score, post_id)
+    keyset cursor `after`, or None when the index is not ready."""
+    score, post_id = after or ("", 0)
+    entries = _recent_page(
+        keys=[RECENT_INDEX_KEY, RECENT_READY_KEY],
+        args=[score, _recent_member(post_id), count],
+        client=redis_client,
+    )
+    if entries is None:
+        return None
+    return [(int(member), int(float(score))) for member, score in zip(entries[::2], entries[1::2])]
+
+@asynccontextmanager
+async def rebuilding_recent_index():
+    """Clear the recent-posts index for a rebuild.
+
+    Yields False when another worker is already rebuilding. Listings fall
+    back to the database until the block succeeds and the index is marked
+    ready.
+    """
+    lock = _lock("lock:posts:recent", settings.RECENT_INDEX_LOCK_TIMEOUT)
+    if not await run_in_threadpool(_try_acquire, lock):
+        yield False
+        return
+    try:
+        await run_in_threadpool(redis_client.delete, RECENT_READY_KEY, RECENT_INDEX_KEY)
+        yield True
+        await run_in_threadpool(redis_client.set, RECENT_READY_KEY, 1)
+    finally:
+        await run_in_threadpool(_release, lock)
+
+def recent_index_ready() -> bool:
+    return bool(redis_client.exists(RECENT_READY_KEY))
+
+def _generation_seed() -> int:
+    # Start from the clock so a flushed counter never repeats an old value
+    return int(time.time() * 1000)
+
+def get_generation(namespace: str) -> int:
+    key = f"gen:{namespace}"
+    generation = get_cache(key)
+    if generation is None:
+        redis_client.set(key, _generation_seed(), nx=True)
+        generation = get_cache(key)
+    return generation or 0
+
+def apply_cache_operations(operations: List[list]):
+    """Apply queued cache operations in one pipeline. Each is [action, *args]:
+
+    - ["invalidate", key]
+    - ["bump", namespace]: bump the namespace generation
+    - ["index", post_id, score] / ["unindex", post_id]: recent-posts index
+    - ["forget_views", post_id]
+
+    Repeats within a batch are applied once; one bump invalidates a
+    namespace as well as several would.
+    """
+    keys, namespaces, indexed, unindexed, forgotten = set(), set(), {}, set(), set()
+    for action, *args in operations:
+        if action == "invalidate":
+            keys.add(args[0])
+        elif action == "bump":
+            namespaces.add(args[0])
+        elif action == "index":
+            indexed[args[0]] = args[1]
+        elif action == "unindex":
+            unindexed.add(args[0])
+        elif action == "forget_views":
+            forgotten.add(args[0])
+        else:
+            raise ValueError(f"Unknown cache operation {action!r}")
+
+    generation_keys = [f"gen:{namespace}" for namespace in sorted(namespaces)]
+    pipe = redis_client.pipeline(transaction=False)
+    if keys:
+        pipe.delete(*keys)
+    for key in generation_keys:
+        # Every key built from the old generation becomes unreachable at
+        # once; the orphans simply age out through their TTL
+        pipe.set(key, _generation_seed(), nx=True)
+        pipe.incr(key)
+    if indexed:
+        pipe.zadd(RECENT_INDEX_KEY, {_recent_member(post_id): score for post_id, score in indexed.items()})
+    if unindexed:
+        pipe.zrem(RECENT_INDEX_KEY, *map(_recent_member, unindexed))
+    if forgotten:
+        pipe.hdel(VIEW_DELTAS_KEY, *forgotten)
+        pipe.zrem(VIEW_RANKING_KEY, *forgotten)
+    pipe.execute()
+
+    dropped = [*keys, *generation_keys]
+    if local_cache is not None and dropped:
+        local_cache.delete(*dropped)
+        _broadcast(keys=dropped)
+
+def versioned_key(namespace: str, *parts) -> str:
+    return ":".join([namespace, str(get_generation(namespace)), *map(str, parts)])
+
+def get_cache_stats() -> dict:
+    stats = {
+        "local": local_cache.stats() if local_cache is not None else None,
+        "redis": dict(_redis_stats),
+    }
+    try:
+        stats["redis"]["evictions"] = redis_client.info("stats").get("evicted_keys", 0)
+    except RedisError:
+        stats["redis"]["evictions"] = None
+    return stats
+
+def cache_pool_stats() -> dict:
+    return redis_pool_stats(redis_pool)
@@ -1,29 +1,132 @@
+import asyncio
+import logging
+import time
+from typing import Iterable, Optional
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
 from app.models.user import User
-from app.schemas.user import TokenData
+from app.schemas.user import TokenData, User as UserSchema
 from app.core.config import settings
+from app.cache.local import LocalCache
+from app.cache.redis import get_cache, set_cache, invalidate_cache
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
+# For endpoints open to everyone that still care who is asking
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
+
+# Decoded tokens, so repeat callers skip signature verification
+_token_cache = LocalCache(max_entries=4096, ttl=settings.PRINCIPAL_CACHE_TTL)
+
+# Session.info key for the emails whose principals a transaction changed
+PENDING_PRINCIPALS = "pending_principals"
+
+def principal_key(subject: str) -> str:
+    return f"principal:{subject}"
+
+def decode_token_subject(token: str) -> str:
+    subject = _token_cache.get(token)
+    if subject is not None:
+        return subject
+
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    subject = payload.get("sub")
+    if subject is not None:
+        # Never remember a token past its own expiry
+        ttl = payload.get("exp", time.time() + settings.PRINCIPAL_CACHE_TTL) - time.time()
+        if ttl > 0:
+            _token_cache.set(token, subject, ttl)
+    return subject
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def optional_token_subject(token: Optional[str]) -> Optional[str]:
+    # Anonymous or invalid tokens are simply nobody in particular
+    if token is None:
+        return None
+    try:
+        return decode_token_subject(token)
+    except JWTError:
+        return None
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
+        email: str = decode_token_subject(token)
         if email is None:
             raise credentials_exception
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.email == token_data.email).first()
-    if user is None:
+
+    cached_user = await run_in_threadpool(get_cache, principal_key(token_data.email))
+    if cached_user:
+        return User(**UserSchema.model_validate(cached_user).model_dump())
+
+    result = await db.execute(select(User).where(User.email == token_data.email))
+    user = result.scalars().first()
+    if user is None or not user.is_active:
         raise credentials_exception
-    return user 
\ No newline at end of file
+
+    await run_in_threadpool(
+        set_cache,
+        principal_key(user.email),
+        UserSchema.model_validate(user).model_dump(mode="json"),
+        settings.PRINCIPAL_CACHE_TTL,
+    )
+    return user
+
+# Bulk update(User) / delete(User) statements skip these mapper events;
+# their principals stay cached for up to PRINCIPAL_CACHE_TTL unless the
+# caller invalidates principal_key(email) itself
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def collect_principal(mapper, connection, target):
+    # Both the old and the new email, dropped once the flush commits
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    pending = object_session(target).info.setdefault(PENDING_PRINCIPALS, set())
+    pending.update(email for email in emails if email)
+
+# Evictions still running in the threadpool, kept until they finish
+_evictions = set()
+
+def evict_principals(emails: Iterable[str]):
+    for email in emails:
+        invalidate_cache(principal_key(email))
+
+async def _evict_in_threadpool(emails: Iterable[str]):
+    try:
+        await run_in_threadpool(evict_principals, emails)
+    except Exception:
+        logger.exception("Evicting cached principals failed; they expire with PRINCIPAL_CACHE_TTL")
+
+@event.listens_for(Session, "after_commit")
+def invalidate_principals(session):
+    # Not before: a request racing the commit would cache the old row again
+    emails = session.info.pop(PENDING_PRINCIPALS, None)
+    if not emails:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # A sync session (scripts, tests) has no event loop to block
+        evict_principals(emails)
+        return
+    # An AsyncSession commits on the event loop, which this hook cannot
+    # await from; the Redis calls go to the threadpool right after
+    task = asyncio.create_task(_evict_in_threadpool(emails))
+    _evictions.add(task)
+    task.add_done_callback(_evictions.discard)
+
+@event.listens_for(Session, "after_rollback")
+def forget_principals(session):
+    session.info.pop(PENDING_PRINCIPALS, None)
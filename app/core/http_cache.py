@@ -0,0 +1,109 @@
+import hashlib
+from datetime import datetime, UTC
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple, Optional
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+# Bodies above this are sent in chunks of this size. Only the write is
+# chunked: bodies are serialized whole, because they are cached and their
+# ETag covers the full bytes. Pages are capped at 100 posts; unbounded
+# result sets go through /api/posts/export, which does stream serialization
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def etag_for(body: bytes) -> str:
+    # Strong validator: identical representations hash identically
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def generation_etag(namespace: str, generation: int, *parts) -> str:
+    # Listings change only when their namespace generation is bumped
+    raw = ":".join([namespace, str(generation), *map(str, parts)])
+    return '"g-%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.astimezone(UTC).replace(microsecond=0)
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value, usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[str] = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses the weak comparison function and wins over If-Modified-Since
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def validator_headers(etag: str, last_modified: Optional[str] = None) -> dict:
+    headers = {"ETag": etag}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+
+def not_modified(etag: str, last_modified: Optional[str] = None) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
+
+
+class CachedResponse(NamedTuple):
+    """A final JSON body plus its validators, stored verbatim in the cache."""
+
+    body: bytes
+    etag: str
+    last_modified: Optional[str] = None
+
+    def pack(self) -> bytes:
+        return f"{self.etag}\t{self.last_modified or ''}\n".encode() + self.body
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "CachedResponse":
+        header, _, body = data.partition(b"\n")
+        etag, _, last_modified = header.decode().partition("\t")
+        return cls(body, etag, last_modified or None)
+
+    def respond(self, request: Request) -> Response:
+        if is_not_modified(request, self.etag, self.last_modified):
+            return not_modified(self.etag, self.last_modified)
+        headers = validator_headers(self.etag, self.last_modified)
+        if len(self.body) > STREAM_CHUNK_SIZE:
+            # Already in memory; chunks let compression and the socket
+            # write proceed piece by piece instead of in one large buffer
+            headers["Content-Length"] = str(len(self.body))
+            return StreamingResponse(self.iter_chunks(), media_type="application/json", headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+    async def iter_chunks(self):
+        for start in range(0, len(self.body), STREAM_CHUNK_SIZE):
+            yield self.body[start:start + STREAM_CHUNK_SIZE]
+
+
+def build_response(data, etag: Optional[str] = None, last_modified: Optional[datetime] = None) -> CachedResponse:
+    body = orjson.dumps(data)
+    return CachedResponse(
+        body,
+        etag or etag_for(body),
+        http_date(last_modified) if last_modified else None,
+    )
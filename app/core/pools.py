@@ -0,0 +1,115 @@
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from redis import BlockingConnectionPool
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+
+class WaitStats:
+    """Running totals of how long callers waited to check out a connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.count,
+                "total_seconds": round(self.total_seconds, 6),
+                "avg_seconds": round(self.total_seconds / self.count, 6) if self.count else 0.0,
+                "max_seconds": round(self.max_seconds, 6),
+                "timeouts": self.timeouts,
+            }
+
+
+class _TimedCheckoutMixin:
+    wait_stats: WaitStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        return connection
+
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    wait_stats = WaitStats()
+
+
+def timed_async_pool_class(name: str):
+    # A subclass per engine so each pool keeps its own wait statistics
+    return type(name, (TimedAsyncQueuePool,), {"wait_stats": WaitStats()})
+
+
+class TimedBlockingConnectionPool(BlockingConnectionPool):
+    """Redis pool that blocks up to ``timeout`` for a free connection and
+    keeps checkout counts and wait times."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = WaitStats()
+        self.in_use = 0
+
+    def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except RedisConnectionError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        # Checkouts come from many threadpool threads at once
+        with self._lock:
+            self.in_use += 1
+        return connection
+
+    def release(self, connection):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+        super().release(connection)
+
+
+def queue_pool_stats(pool) -> dict:
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+    }
+    if isinstance(pool, _TimedCheckoutMixin):
+        stats["wait"] = pool.wait_stats.snapshot()
+    return stats
+
+
+def redis_pool_stats(pool) -> dict:
+    stats = {"max_connections": pool.max_connections}
+    if isinstance(pool, TimedBlockingConnectionPool):
+        with pool._lock:
+            created, in_use = len(pool._connections), pool.in_use
+        stats.update(
+            created=created,
+            checked_out=in_use,
+            idle=max(created - in_use, 0),
+            wait=pool.wait_stats.snapshot(),
+        )
+    return stats
@@ -0,0 +1,21 @@
+import math
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from app.cache.redis import take_tokens
+from app.core.config import settings
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy listed in FORWARDED_ALLOW_IPS, uvicorn has already put
+    # the X-Forwarded-For address here
+    return request.client.host if request.client else "unknown"
+
+async def enforce_rate_limit(buckets: dict):
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    wait = await run_in_threadpool(take_tokens, buckets)
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please retry later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
@@ -0,0 +1,62 @@
+"""Create or upgrade the database schema.
+
+    python -m app.db.migrate
+
+Run once per deploy, before the workers start. New databases get every
+table from the models. Existing PostgreSQL databases first run the scripts
+in migrations/ they have not seen yet, in order; applied scripts are
+recorded in schema_migrations.
+"""
+import asyncio
+from pathlib import Path
+from typing import List
+from sqlalchemy import Column, DateTime, MetaData, String, Table, insert, inspect, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.db import search  # noqa: F401  (full-text search DDL runs on table creation)
+from app.db.database import Base, async_engine
+from app.db.timestamps import utcnow
+from app.models import outbox, post, user  # noqa: F401
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("name", String, primary_key=True),
+    Column("applied_at", DateTime(timezone=True), nullable=False, server_default=utcnow()),
+)
+
+async def migrate(engine: AsyncEngine = async_engine) -> List[str]:
+    """Bring the schema up to date. Returns the scripts that were run."""
+    scripts = sorted(MIGRATIONS_DIR.glob("*.sql"))
+    async with engine.begin() as conn:
+        fresh = not await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("posts"))
+        await conn.run_sync(schema_migrations.create, checkfirst=True)
+        applied = set(await conn.scalars(select(schema_migrations.c.name)))
+    pending = [script for script in scripts if script.name not in applied]
+
+    ran = []
+    if not fresh and engine.dialect.name == "postgresql":
+        for script in pending:
+            async with engine.connect() as conn:
+                # Scripts hold several statements and manage their own transactions
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.execute(script.read_text())
+                await conn.execute(insert(schema_migrations).values(name=script.name))
+                await conn.commit()
+            ran.append(script.name)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if fresh and pending:
+            # Built from the current models, so every script is already reflected
+            await conn.execute(insert(schema_migrations), [{"name": script.name} for script in pending])
+    return ran
+
+async def main():
+    ran = await migrate()
+    await async_engine.dispose()
+    print(f"Applied {', '.join(ran)}" if ran else "Schema is up to date")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from typing import List, Tuple
+from fastapi.concurrency import run_in_threadpool
+from redis import RedisError
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache.redis import apply_cache_operations, exclusive
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.outbox import CacheOutbox
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_BATCH_SIZE = 500
+
+def enqueue_cache_operations(db: AsyncSession, operations: List[list]):
+    # Committed, or rolled back, together with the caller's transaction
+    db.add(CacheOutbox(operations=operations))
+
+def apply_committed_operations(operations: List[list]) -> bool:
+    """Apply a committed write's cache operations straight away, best effort.
+
+    Its outbox row stays queued either way, so whatever Redis misses here is
+    applied by the next dispatch. Returns False when Redis was unavailable.
+    """
+    try:
+        apply_cache_operations(operations)
+    except RedisError:
+        logger.warning("Applying cache operations inline failed, leaving them to the outbox", exc_info=True)
+        return False
+    return True
+
+def _apply_rows(rows) -> Tuple[List[int], List[int]]:
+    """Apply rows one at a time, in order, after their batch was rejected.
+    Returns the ids that are done and the ids left for the next run."""
+    done = []
+    for index, row in enumerate(rows):
+        try:
+            apply_cache_operations(row.operations)
+        except RedisError:
+            logger.warning("Applying %d outbox entries failed, will retry", len(rows) - index, exc_info=True)
+            return done, [row.id for row in rows[index:]]
+        except Exception:
+            # A malformed entry would block the queue head forever; drop it
+            logger.exception("Dropping outbox entry %d with operations %r", row.id, row.operations)
+        done.append(row.id)
+    return done, []
+
+async def _dispatch_batches(db: AsyncSession) -> int:
+    dispatched = 0
+    while True:
+        # Should the lock expire mid-dispatch, the row locks still make a
+        # second dispatcher wait its turn
+        query = (
+            select(CacheOutbox.id, CacheOutbox.operations)
+            .order_by(CacheOutbox.id)
+            .limit(DISPATCH_BATCH_SIZE)
+            .with_for_update()
+        )
+        rows = (await db.execute(query)).all()
+        if not rows:
+            break
+
+        done, failed = [row.id for row in rows], []
+        try:
+            await run_in_threadpool(apply_cache_operations, [operation for row in rows for operation in row.operations])
+        except RedisError:
+            logger.warning("Applying %d outbox entries failed, will retry", len(rows), exc_info=True)
+            done, failed = [], done
+        except Exception:
+            done, failed = await run_in_threadpool(_apply_rows, rows)
+
+        if done:
+            await db.execute(delete(CacheOutbox).where(CacheOutbox.id.in_(done)))
+        if failed:
+            await db.execute(update(CacheOutbox).where(CacheOutbox.id.in_(failed)).values(attempts=CacheOutbox.attempts + 1))
+        await db.commit()
+        dispatched += len(done)
+        if failed or len(rows) < DISPATCH_BATCH_SIZE:
+            break
+    return dispatched
+
+async def dispatch_outbox(db: AsyncSession) -> int:
+    """Apply queued cache operations to Redis, oldest first, in pipelined
+    batches. Returns the number of outbox rows applied; a batch Redis
+    rejects stays queued for the next run.
+
+    One worker dispatches at a time, so a later batch can never overtake an
+    earlier one, e.g. an unindex landing before the index it undoes. Returns
+    0 straight away while another worker holds the lock.
+    """
+    try:
+        async with exclusive("outbox", settings.OUTBOX_LOCK_TIMEOUT) as acquired:
+            return await _dispatch_batches(db) if acquired else 0
+    except RedisError:
+        # Not even the lock could be taken; the rows wait for the next run
+        logger.warning("Redis is unavailable, leaving the cache outbox queued", exc_info=True)
+        return 0
+
+async def run_outbox_dispatcher(interval: float):
+    # Catches whatever the post-request dispatch missed: Redis outages,
+    # crashed workers
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                await dispatch_outbox(db)
+        except Exception:
+            logger.exception("Dispatching the cache outbox failed")
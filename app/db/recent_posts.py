@@ -0,0 +1,73 @@
+"""Rebuild the Redis recent-posts index from the posts table.
+
+    python -m app.db.recent_posts
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, UTC
+from typing import Iterable, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache.redis import add_recent_posts, rebuilding_recent_index, recent_index_ready
+from app.db.database import AsyncSessionLocal
+from app.models.post import Post
+from app.schemas.types import as_utc
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 1000
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+MICROSECOND = timedelta(microseconds=1)
+
+def post_score(created_at: datetime) -> int:
+    # Whole microseconds stay exact in a sorted set's double scores
+    return (as_utc(created_at) - EPOCH) // MICROSECOND
+
+def score_created_at(score: int) -> datetime:
+    return EPOCH + score * MICROSECOND
+
+def index_posts(posts: Iterable):
+    add_recent_posts({post.id: post_score(post.created_at) for post in posts})
+
+def index_operations(posts: Iterable) -> List[list]:
+    # The same, queued through the cache outbox. A new id may have been
+    # looked up before it existed, so its remembered 404 is dropped too
+    return [
+        operation
+        for post in posts
+        for operation in (["index", post.id, post_score(post.created_at)], ["invalidate", f"post:{post.id}"])
+    ]
+
+async def rebuild_recent_index(db: AsyncSession) -> Optional[int]:
+    """Repopulate the index, e.g. after Redis lost it. Returns the number of
+    posts indexed, or None when another worker is already rebuilding."""
+    async with rebuilding_recent_index() as rebuilding:
+        if not rebuilding:
+            return None
+        indexed = 0
+        query = select(Post.id, Post.created_at).execution_options(yield_per=REBUILD_BATCH_SIZE)
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            await run_in_threadpool(index_posts, rows)
+            indexed += len(rows)
+    return indexed
+
+async def ensure_recent_index():
+    if await run_in_threadpool(recent_index_ready):
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            indexed = await rebuild_recent_index(db)
+        if indexed is not None:
+            logger.info("Rebuilt the recent-posts index with %d posts", indexed)
+    except Exception:
+        logger.exception("Rebuilding the recent-posts index failed")
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        indexed = await rebuild_recent_index(db)
+    print("Another worker is rebuilding the index" if indexed is None else f"Indexed {indexed} posts")
+
+if __name__ == "__main__":
+    asyncio.run(main())
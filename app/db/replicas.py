@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from typing import List, Optional
+from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.dependencies import get_current_user, optional_oauth2_scheme, optional_token_subject
+from app.core.pools import queue_pool_stats, timed_async_pool_class
+from app.db.database import AsyncSessionLocal, async_database_url, engine_options, get_db
+from app.db.outbox import apply_committed_operations
+from app.db.profiling import profile_engine
+from app.models.user import User
+from app.cache.redis import get_cache, set_cache
+
+logger = logging.getLogger(__name__)
+
+class ReplicaSet:
+    """Round-robin over replica engines, skipping any that recently failed."""
+
+    def __init__(self, engines: List[AsyncEngine], retry_seconds: float):
+        self.engines = engines
+        self.retry_seconds = retry_seconds
+        self._down_until = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def choose(self) -> Optional[AsyncEngine]:
+        if not self.engines:
+            return None
+        now = time.monotonic()
+        start = next(self._counter)
+        for offset in range(len(self.engines)):
+            engine = self.engines[(start + offset) % len(self.engines)]
+            # A replica past its retry window gets another chance
+            if self._down_until.get(engine, 0) <= now:
+                return engine
+        return None
+
+    def mark_down(self, engine: AsyncEngine):
+        with self._lock:
+            self._down_until[engine] = time.monotonic() + self.retry_seconds
+
+    def is_down(self, engine: AsyncEngine) -> bool:
+        return self._down_until.get(engine, 0) > time.monotonic()
+
+    def watch(self, engine: AsyncEngine):
+        @event.listens_for(engine.sync_engine, "handle_error")
+        def on_error(context):
+            # Connection failures take the replica out of rotation
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(engine)
+
+def create_replica_engines(urls: List[str]) -> List[AsyncEngine]:
+    return [
+        create_async_engine(
+            async_database_url(url),
+            poolclass=timed_async_pool_class(f"ReplicaPool{index}"),
+            **engine_options(),
+        )
+        for index, url in enumerate(urls)
+    ]
+
+replica_set = ReplicaSet(create_replica_engines(settings.replica_urls), settings.REPLICA_RETRY_SECONDS)
+for index, replica in enumerate(replica_set.engines):
+    replica_set.watch(replica)
+    instrument_engine(replica, f"replica_{index}")
+    profile_engine(replica)
+
+_replays = set()
+
+@event.listens_for(Session, "do_orm_execute")
+def retry_on_primary(orm_execute_state):
+    fallback = orm_execute_state.session.info.get("fallback_bind")
+    if fallback is None:
+        return None
+    try:
+        return orm_execute_state.invoke_statement()
+    except DBAPIError:
+        # A replica that is down or lagging badly should cost a retry, not a 500
+        logger.warning("Replica read failed, retrying on the primary", exc_info=True)
+        return orm_execute_state.invoke_statement(bind_arguments={"bind": fallback})
+
+async def mark_write(user: User):
+    # Pin the writer to the primary until the replicas have had time to
+    # catch up; everyone else keeps reading from the replicas
+    if replica_set.engines:
+        await run_in_threadpool(set_cache, f"ryw:user:{user.email}", 1, settings.READ_YOUR_WRITES_SECONDS)
+
+async def _replay(operations: List[list]):
+    await asyncio.sleep(settings.READ_YOUR_WRITES_SECONDS)
+    await run_in_threadpool(apply_committed_operations, operations)
+
+def replay_after_lag(operations: List[list]):
+    """Apply a write's invalidations again once the replicas have caught up.
+
+    Other readers may still be served by a lagging replica right after the
+    write and put the old rows back in the cache. Best effort, like the
+    inline apply: a worker that exits first simply skips the replay.
+    """
+    invalidations = [operation for operation in operations if operation[0] in ("invalidate", "bump")]
+    if replica_set.engines and invalidations:
+        task = asyncio.create_task(_replay(invalidations))
+        _replays.add(task)
+        task.add_done_callback(_replays.discard)
+
+async def choose_read_engine(subject: Optional[str]) -> Optional[AsyncEngine]:
+    if not replica_set.engines:
+        return None
+    if subject is not None and await run_in_threadpool(get_cache, f"ryw:user:{subject}"):
+        return None
+    return replica_set.choose()
+
+async def _read_session(db: AsyncSession, subject: Optional[str]):
+    engine = await choose_read_engine(subject)
+    if engine is None:
+        yield db
+        return
+    # Statements the replica fails are retried once on the primary
+    async with AsyncSessionLocal(bind=engine, info={"fallback_bind": db.get_bind()}) as replica_db:
+        yield replica_db
+
+async def get_read_db(
+    db: AsyncSession = Depends(get_db),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    async for session in _read_session(db, optional_token_subject(token)):
+        yield session
+
+async def get_user_read_db(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    async for session in _read_session(db, current_user.email):
+        yield session
+
+async def dispose_replicas():
+    for replica in replica_set.engines:
+        await replica.dispose()
+
+def replica_pool_stats() -> dict:
+    return {
+        f"replica_{index}": {
+            **queue_pool_stats(replica.pool),
+            "healthy": not replica_set.is_down(replica),
+        }
+        for index, replica in enumerate(replica_set.engines)
+    }
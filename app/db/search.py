@@ -0,0 +1,82 @@
+from sqlalchemy import DDL, column, event, func, literal_column, select, table, text
+from app.models.post import Post
+
+# Postgres keeps a weighted tsvector in a generated column, so every
+# INSERT/UPDATE on posts refreshes it inside the same statement. Existing
+# databases get it from migrations/004_post_search.sql; keep the two in step
+POSTGRES_DDL = [
+    """
+    ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector)",
+]
+
+# SQLite mirrors posts into an external-content FTS5 table through triggers.
+# Only edits to the indexed columns reindex a post, not view-count flushes
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts
+    USING fts5(title, content, content='posts', content_rowid='id')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    "INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')",
+]
+
+for statement in POSTGRES_DDL:
+    event.listen(Post.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_DDL:
+    event.listen(Post.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    Post.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS posts_fts").execute_if(dialect="sqlite"),
+)
+
+posts_fts = table("posts_fts", column("rowid"))
+
+def fts5_query(q: str) -> str:
+    # Quote every term so user input can never be parsed as FTS5 syntax
+    return " ".join('"%s"' % term.replace('"', '""') for term in q.split())
+
+def search_posts_query(dialect_name: str, q: str, limit: int, offset: int):
+    # Pages are OFFSET-based: every page ranks all the matches anyway, so a
+    # keyset on the rank would save little, and cached pages absorb repeats
+    if dialect_name == "postgresql":
+        tsquery = func.websearch_to_tsquery("english", q)
+        search_vector = literal_column("posts.search_vector")
+        rank = func.ts_rank_cd(search_vector, tsquery)
+        query = (
+            select(Post)
+            .where(search_vector.op("@@")(tsquery))
+            .order_by(rank.desc(), Post.id.desc())
+        )
+    else:
+        # bm25() is lower-is-better; titles weigh ten times the body
+        query = (
+            select(Post)
+            .join(posts_fts, posts_fts.c.rowid == Post.id)
+            .where(text("posts_fts MATCH :match").bindparams(match=fts5_query(q)))
+            .order_by(text("bm25(posts_fts, 10.0, 1.0)"), Post.id.desc())
+        )
+    return query.limit(limit).offset(offset)
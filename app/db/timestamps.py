@@ -0,0 +1,18 @@
+from sqlalchemy import DateTime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+class utcnow(FunctionElement):
+    """Database-side current timestamp, usable as a server default."""
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+@compiles(utcnow, "sqlite")
+def _sqlite_utcnow(element, compiler, **kw):
+    # Same text layout SQLAlchemy binds datetimes with, so keyset
+    # comparisons against cursor values sort and match correctly
+    return "(strftime('%Y-%m-%d %H:%M:%f000', 'now'))"
@@ -0,0 +1,40 @@
+import asyncio
+import logging
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache.redis import pending_view_deltas
+from app.db.database import AsyncSessionLocal
+from app.models.post import Post
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 1000
+
+posts = Post.__table__
+increment_views = (
+    update(posts)
+    .where(posts.c.id == bindparam("post_id"))
+    # A view is not an edit: without pinning updated_at, its onupdate would
+    # move it and with it the post's Last-Modified
+    .values(view_count=posts.c.view_count + bindparam("delta"), updated_at=posts.c.updated_at)
+)
+
+async def flush_view_counts(db: AsyncSession) -> int:
+    """Write the view counts gathered in Redis back to the posts table."""
+    async with pending_view_deltas() as deltas:
+        rows = [{"post_id": post_id, "delta": delta} for post_id, delta in deltas.items()]
+        # One executemany UPDATE per batch, in a single transaction
+        for start in range(0, len(rows), FLUSH_BATCH_SIZE):
+            await db.execute(increment_views, rows[start:start + FLUSH_BATCH_SIZE])
+        if rows:
+            await db.commit()
+    return len(rows)
+
+async def run_view_flusher(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                await flush_view_counts(db)
+        except Exception:
+            logger.exception("Flushing view counts failed")
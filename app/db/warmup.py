@@ -0,0 +1,102 @@
+"""Preload the post caches, e.g. after a deploy or a Redis restart.
+
+    python -m app.db.warmup --pages 5 --page-size 100 --top 1000 --concurrency 4
+"""
+import argparse
+import asyncio
+import logging
+from typing import List
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from app.api.posts import MAX_BATCH_SIZE, paginate, post_response
+from app.cache.redis import (
+    exclusive, get_generation, missing_keys, most_viewed, recent_index_ready,
+    set_many_cache_raw, versioned_key
+)
+from app.core.config import settings
+from app.core.http_cache import build_response, generation_etag
+from app.db.database import AsyncSessionLocal
+from app.db.recent_posts import ensure_recent_index
+from app.models.post import Post
+
+logger = logging.getLogger(__name__)
+
+async def warm_posts(sessions, post_ids: List[int], concurrency: int) -> int:
+    # Only posts Redis does not already hold, MAX_BATCH_SIZE per IN query
+    missing = await run_in_threadpool(missing_keys, [f"post:{post_id}" for post_id in post_ids])
+    cold = [int(key.removeprefix("post:")) for key in missing]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(batch: List[int]) -> int:
+        async with semaphore, sessions() as db:
+            posts = (await db.execute(select(Post).where(Post.id.in_(batch)))).scalars().all()
+        if posts:
+            await run_in_threadpool(set_many_cache_raw, {f"post:{post.id}": post_response(post).pack() for post in posts})
+        return len(posts)
+
+    batches = [cold[start:start + MAX_BATCH_SIZE] for start in range(0, len(cold), MAX_BATCH_SIZE)]
+    return sum(await asyncio.gather(*(load(batch) for batch in batches)))
+
+async def warm_listing(sessions, pages: int, page_size: int) -> int:
+    if await run_in_threadpool(recent_index_ready):
+        # Pages are assembled from the index and the post bodies instead
+        return 0
+
+    # The same entries read_posts stores, built by walking the cursors
+    generation = await run_in_threadpool(get_generation, "all_posts")
+    entries, cursor = {}, None
+    async with sessions() as db:
+        for _ in range(pages):
+            page = await paginate(db, select(Post), cursor, page_size)
+            etag = generation_etag("all_posts", generation, cursor or "", page_size)
+            key = await run_in_threadpool(versioned_key, "all_posts", cursor or "", page_size)
+            entries[key] = build_response(page, etag=etag).pack()
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+    if entries:
+        await run_in_threadpool(set_many_cache_raw, entries)
+    return len(entries)
+
+async def warm_cache(sessions, pages: int, page_size: int, top: int, concurrency: int) -> dict:
+    """Load the first listing pages and the newest and most viewed posts
+    into the cache. Returns how many posts and pages were written."""
+    async with sessions() as db:
+        newest = (await db.execute(
+            select(Post.id).order_by(Post.created_at.desc(), Post.id.desc()).limit(max(top, pages * page_size))
+        )).scalars().all()
+    post_ids = list(dict.fromkeys([*newest, *await run_in_threadpool(most_viewed, top)]))
+    return {
+        "posts": await warm_posts(sessions, post_ids, concurrency),
+        "pages": await warm_listing(sessions, pages, page_size),
+    }
+
+async def warm_up_caches():
+    # Startup task: restore the recent-posts index, then let one worker warm
+    await ensure_recent_index()
+    if not settings.WARMUP_ENABLED:
+        return
+    try:
+        async with exclusive("warmup", settings.WARMUP_LOCK_TIMEOUT) as acquired:
+            if acquired:
+                warmed = await warm_cache(
+                    AsyncSessionLocal, settings.WARMUP_PAGES, settings.WARMUP_PAGE_SIZE,
+                    settings.WARMUP_TOP_POSTS, settings.WARMUP_CONCURRENCY,
+                )
+                logger.info("Warmed %d posts and %d listing pages", warmed["posts"], warmed["pages"])
+    except Exception:
+        logger.exception("Cache warm-up failed")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--pages", type=int, default=settings.WARMUP_PAGES)
+    parser.add_argument("--page-size", type=int, default=settings.WARMUP_PAGE_SIZE)
+    parser.add_argument("--top", type=int, default=settings.WARMUP_TOP_POSTS, help="Newest and most viewed posts to load")
+    parser.add_argument("--concurrency", type=int, default=settings.WARMUP_CONCURRENCY, help="Queries in flight at once")
+    args = parser.parse_args()
+
+    warmed = asyncio.run(warm_cache(AsyncSessionLocal, args.pages, args.page_size, args.top, args.concurrency))
+    print(f"Warmed {warmed['posts']} posts and {warmed['pages']} listing pages")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,46 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import auth, posts
-from app.db.database import Base, engine
+from app.api import auth, health, posts
+from app.cache.redis import close_cache
+from app.db.database import AsyncSessionLocal, async_engine
+from app.db.replicas import dispose_replicas
+from app.db.outbox import dispatch_outbox, run_outbox_dispatcher
+from app.db.view_counts import flush_view_counts, run_view_flusher
+from app.db.warmup import warm_up_caches
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, mark_worker_exited, render_metrics
+from app.core.security import shutdown_hash_executor
+from app.db.profiling import QueryStatsMiddleware
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importing the app does no I/O: engines and Redis connect on first use,
+    # and the schema is created by `python -m app.db.migrate`, not on boot
+    flusher = asyncio.create_task(run_view_flusher(settings.VIEW_FLUSH_INTERVAL))
+    dispatcher = asyncio.create_task(run_outbox_dispatcher(settings.OUTBOX_DISPATCH_INTERVAL))
+    # Requests are served meanwhile, from the database where still cold
+    warmer = asyncio.create_task(warm_up_caches())
+    yield
+    for task in (flusher, dispatcher, warmer):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    try:
+        # Write back whatever was counted or queued since the last periodic run
+        async with AsyncSessionLocal() as db:
+            await flush_view_counts(db)
+            await dispatch_outbox(db)
+    finally:
+        await async_engine.dispose()
+        await dispose_replicas()
+        close_cache()
+        shutdown_hash_executor()
+        mark_worker_exited()
 
-app = FastAPI(title="Blog API")
+app = FastAPI(title="Blog API", lifespan=lifespan)
 
 # CORS configuration
 origins = [
@@ -21,10 +55,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(posts.router, prefix="/api/posts", tags=["Posts"])
+app.include_router(health.router, prefix="/api/health", tags=["Health"])
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,15 @@
+from sqlalchemy import JSON, Column, DateTime, Integer
+from app.db.database import Base
+from app.db.timestamps import utcnow
+
+class CacheOutbox(Base):
+    """Cache operations committed with the write that caused them, applied
+    to Redis afterwards by app/db/outbox.py."""
+
+    __tablename__ = "cache_outbox"
+
+    id = Column(Integer, primary_key=True)
+    # [[action, *args], ...], see app.cache.redis.apply_cache_operations
+    operations = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=utcnow())
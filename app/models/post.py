@@ -1,7 +1,7 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 from app.db.database import Base
-from datetime import datetime
+from app.db.timestamps import utcnow
 
 class Post(Base):
     __tablename__ = "posts"
@@ -10,7 +10,16 @@ class Post(Base):
     title = Column(String, index=True)
     content = Column(Text)
     author_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(String, default=str(datetime.now()))
-    updated_at = Column(String, default=str(datetime.now()), onupdate=str(datetime.now()))
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=utcnow())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=utcnow(), onupdate=utcnow())
+    # Written back periodically from Redis, see app/db/view_counts.py
+    view_count = Column(Integer, nullable=False, default=0, server_default="0")
     
-    author = relationship("User", back_populates="posts") 
\ No newline at end of file
+    author = relationship("User", back_populates="posts")
+
+    # Keyset pagination reads these in (created_at DESC, id DESC) order,
+    # so listings are ordered index scans instead of sorts
+    __table_args__ = (
+        Index("ix_posts_created_at_desc_id_desc", created_at.desc(), id.desc()),
+        Index("ix_posts_author_id_created_at_desc_id_desc", author_id, created_at.desc(), id.desc()),
+    ) 
\ No newline at end of file
@@ -1,7 +1,7 @@
 from sqlalchemy import Boolean, Column, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 from app.db.database import Base
-from datetime import datetime
+from app.db.timestamps import utcnow
 
 class User(Base):
     __tablename__ = "users"
@@ -11,6 +11,6 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
-    created_at = Column(String, default=str(datetime.now()))
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=utcnow())
     
     posts = relationship("Post", back_populates="author") 
\ No newline at end of file
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from app.schemas.types import UTCDateTime
 
 class PostBase(BaseModel):
     title: str
@@ -16,7 +17,12 @@ class PostUpdate(PostBase):
 class Post(PostBase):
     id: int
     author_id: int
-    created_at: str
-    updated_at: str
+    created_at: UTCDateTime
+    updated_at: UTCDateTime
+    view_count: int = 0
 
-    model_config = ConfigDict(from_attributes=True) 
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class PostPage(BaseModel):
+    items: List[Post]
+    next_cursor: Optional[str] = None
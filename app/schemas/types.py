@@ -0,0 +1,9 @@
+from datetime import datetime, UTC
+from typing import Annotated
+from pydantic import AfterValidator
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive values; every stored timestamp is UTC
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value.astimezone(UTC)
+
+UTCDateTime = Annotated[datetime, AfterValidator(as_utc)]
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr, ConfigDict
 from typing import List, Optional
 from datetime import datetime
+from app.schemas.types import UTCDateTime
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -16,7 +17,7 @@ class UserLogin(BaseModel):
 class User(UserBase):
     id: int
     is_active: bool
-    created_at: str
+    created_at: UTCDateTime
 
     model_config = ConfigDict(from_attributes=True)
 
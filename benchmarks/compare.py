@@ -0,0 +1,50 @@
+"""Compare two benchmark result files.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+
+Exits non-zero when any endpoint's p95 latency grew, or its throughput
+dropped, by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+def change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+
+    print(f"{baseline['meta']['commit']} -> {candidate['meta']['commit']}")
+    print(f"{'endpoint':<10}{'rps':>22}{'p95 ms':>26}")
+
+    regressions = []
+    rows = [*candidate["endpoints"].items(), ("overall", candidate["overall"])]
+    for name, new in rows:
+        old = baseline["overall"] if name == "overall" else baseline["endpoints"].get(name)
+        if old is None:
+            continue
+        rps_change, p95_change = change(old["rps"], new["rps"]), change(old["p95_ms"], new["p95_ms"])
+        print(
+            f"{name:<10}{old['rps']:>9.1f} -> {new['rps']:>7.1f} {rps_change:+6.1f}%"
+            f"{old['p95_ms']:>9.2f} -> {new['p95_ms']:>7.2f} {p95_change:+6.1f}%"
+        )
+        if rps_change < -args.threshold or p95_change > args.threshold:
+            regressions.append(name)
+
+    old_ratio, new_ratio = baseline["cache"]["hit_ratio"], candidate["cache"]["hit_ratio"]
+    print(f"cache hit ratio: {old_ratio} -> {new_ratio}")
+
+    if regressions:
+        print(f"regressed beyond {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""HTTP load benchmark for the Blog API.
+
+Seeds users and posts, then drives the real ASGI app in-process with a
+concurrent httpx client. Everything runs offline: SQLite in a temporary
+directory and an in-process fakeredis server.
+
+    python -m benchmarks.run --users 10 --posts 2000 --requests 5000 --concurrency 32
+
+Results are written as JSON (see --output) and can be compared between
+commits with `python -m benchmarks.compare old.json new.json`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from datetime import UTC, datetime
+from pathlib import Path
+
+DEFAULT_MIX = "get=50,list=20,me=10,create=10,login=10"
+BATCH_SIZE = 100
+PASSWORD = "benchmark-password"
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name!r}, expected one of {sorted(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(samples: list, pct: float) -> float:
+    # Nearest-rank on an already sorted list
+    index = max(0, min(len(samples) - 1, round(pct / 100 * len(samples) + 0.5) - 1))
+    return samples[index]
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def configure_environment(workdir: str):
+    # Must run before anything from `app` is imported: settings are read once
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ["DATABASE_REPLICA_URLS"] = ""
+    os.environ["DB_QUERY_HEADERS"] = "true"
+    # Every benchmark request comes from one address
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+def use_fake_redis():
+    """Point the cache at an in-process fakeredis server."""
+    import fakeredis
+    from redis import Redis
+    from app.cache import redis as cache
+    from app.core.pools import TimedBlockingConnectionPool
+
+    server = fakeredis.FakeServer()
+    options = {**cache.redis_pool_options(), "connection_class": fakeredis.FakeConnection, "server": server}
+    options.pop("socket_connect_timeout")
+    cache.redis_pool = TimedBlockingConnectionPool(**options)
+    cache.redis_client = Redis(connection_pool=cache.redis_pool)
+
+    # Same listener the app starts lazily, subscribed on the fake server
+    pubsub = cache.redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(**{cache.INVALIDATION_CHANNEL: cache._handle_invalidation})
+    cache._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+async def login(client, ctx, rng):
+    account = rng.choice(ctx["accounts"])
+    return await client.post("/api/auth/login", data={"username": account["email"], "password": PASSWORD})
+
+async def create(client, ctx, rng):
+    account = rng.choice(ctx["accounts"])
+    response = await client.post(
+        "/api/posts/",
+        headers=account["headers"],
+        json={"title": f"Benchmark post {rng.random()}", "content": "Created during the benchmark run"},
+    )
+    if response.status_code == 201:
+        ctx["post_ids"].append(response.json()["id"])
+    return response
+
+async def list_posts(client, ctx, rng):
+    # Mostly the first page, sometimes a deeper one seen earlier
+    cursor = rng.choice(ctx["cursors"]) if ctx["cursors"] and rng.random() < 0.3 else None
+    params = {"limit": 20, **({"cursor": cursor} if cursor else {})}
+    response = await client.get("/api/posts/", params=params)
+    if response.status_code == 200:
+        next_cursor = response.json()["next_cursor"]
+        if next_cursor and len(ctx["cursors"]) < 50:
+            ctx["cursors"].append(next_cursor)
+    return response
+
+async def get_post(client, ctx, rng):
+    return await client.get(f"/api/posts/{rng.choice(ctx['post_ids'])}")
+
+async def my_posts(client, ctx, rng):
+    return await client.get("/api/posts/me", headers=rng.choice(ctx["accounts"])["headers"], params={"limit": 20})
+
+OPERATIONS = {
+    "login": login,
+    "create": create,
+    "list": list_posts,
+    "get": get_post,
+    "me": my_posts,
+}
+
+async def seed(client, users: int, posts: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def make_account(index: int) -> dict:
+        async with semaphore:
+            email = f"bench{index}@example.com"
+            response = await client.post(
+                "/api/auth/register", json={"email": email, "username": f"bench{index}", "password": PASSWORD}
+            )
+            response.raise_for_status()
+            response = await client.post("/api/auth/login", data={"username": email, "password": PASSWORD})
+            response.raise_for_status()
+            return {"email": email, "headers": {"Authorization": f"Bearer {response.json()['access_token']}"}}
+
+    accounts = await asyncio.gather(*(make_account(index) for index in range(users)))
+
+    async def make_batch(start: int) -> list:
+        async with semaphore:
+            account = accounts[(start // BATCH_SIZE) % len(accounts)]
+            batch = [
+                {"title": f"Seed post {number}", "content": f"Seeded content for post {number}"}
+                for number in range(start, min(start + BATCH_SIZE, posts))
+            ]
+            response = await client.post("/api/posts/batch", headers=account["headers"], json=batch)
+            response.raise_for_status()
+            return [post["id"] for post in response.json()]
+
+    batches = await asyncio.gather(*(make_batch(start) for start in range(0, posts, BATCH_SIZE)))
+    return {"accounts": list(accounts), "post_ids": [post_id for batch in batches for post_id in batch], "cursors": []}
+
+async def run_workload(client, ctx: dict, operations: list, concurrency: int, rng: random.Random) -> dict:
+    latencies = defaultdict(list)
+    queries = defaultdict(int)
+    errors = defaultdict(int)
+    pending = iter(operations)
+
+    async def worker():
+        for name in pending:
+            started = time.perf_counter()
+            response = await OPERATIONS[name](client, ctx, rng)
+            latencies[name].append(time.perf_counter() - started)
+            queries[name] += int(response.headers.get("X-DB-Queries", 0))
+            if response.status_code >= 400:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"elapsed": time.perf_counter() - started, "latencies": latencies, "queries": queries, "errors": errors}
+
+def summarize(samples: list, elapsed: float, errors: int, queries: int) -> dict:
+    samples = sorted(samples)
+    count = len(samples)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / elapsed, 2),
+        "mean_ms": round(sum(samples) / count * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+        "db_queries_per_request": round(queries / count, 2),
+    }
+
+def cache_summary(before: dict, after: dict) -> dict:
+    def delta(tier: str, field: str) -> int:
+        return ((after.get(tier) or {}).get(field) or 0) - ((before.get(tier) or {}).get(field) or 0)
+
+    local_hits, local_misses = delta("local", "hits"), delta("local", "misses")
+    redis_hits, redis_misses = delta("redis", "hits"), delta("redis", "misses")
+    # Every lookup ends as an L1 hit, a Redis hit or a Redis miss
+    lookups = local_hits + redis_hits + redis_misses
+
+    def ratio(hits: int, total: int):
+        return round(hits / total, 4) if total else None
+
+    return {
+        "local": {"hits": local_hits, "misses": local_misses, "hit_ratio": ratio(local_hits, local_hits + local_misses)},
+        "redis": {"hits": redis_hits, "misses": redis_misses, "hit_ratio": ratio(redis_hits, redis_hits + redis_misses)},
+        "hit_ratio": ratio(local_hits + redis_hits, lookups),
+    }
+
+async def benchmark(args) -> dict:
+    import httpx
+    use_fake_redis()
+    from app.main import app
+    from app.cache.redis import get_cache_stats
+    from app.db.database import async_engine
+    from app.db.migrate import migrate
+
+    await migrate(async_engine)
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=app)
+    # ASGITransport does not send lifespan events; run startup tasks as a server would
+    async with (
+        app.router.lifespan_context(app),
+        httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client,
+    ):
+        started = time.perf_counter()
+        ctx = await seed(client, args.users, args.posts, args.concurrency)
+        seed_seconds = time.perf_counter() - started
+
+        mix = args.mix
+        warmup = rng.choices(list(mix), weights=list(mix.values()), k=args.warmup)
+        await run_workload(client, ctx, warmup, args.concurrency, rng)
+
+        cache_before = get_cache_stats()
+        operations = rng.choices(list(mix), weights=list(mix.values()), k=args.requests)
+        run = await run_workload(client, ctx, operations, args.concurrency, rng)
+        cache_after = get_cache_stats()
+
+    await async_engine.dispose()
+
+    elapsed = run["elapsed"]
+    endpoints = {
+        name: summarize(samples, elapsed, run["errors"][name], run["queries"][name])
+        for name, samples in sorted(run["latencies"].items())
+    }
+    all_samples = [sample for samples in run["latencies"].values() for sample in samples]
+    return {
+        "meta": {
+            "timestamp": datetime.now(UTC).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                "users": args.users,
+                "posts": args.posts,
+                "requests": args.requests,
+                "warmup": args.warmup,
+                "concurrency": args.concurrency,
+                "mix": mix,
+                "seed": args.seed,
+            },
+        },
+        "seed_seconds": round(seed_seconds, 3),
+        "overall": summarize(all_samples, elapsed, sum(run["errors"].values()), sum(run["queries"].values())),
+        "endpoints": endpoints,
+        "cache": cache_summary(cache_before, cache_after),
+    }
+
+def print_report(results: dict):
+    header = f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = [*results["endpoints"].items(), ("overall", results["overall"])]
+    for name, row in rows:
+        print(
+            f"{name:<10}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10.1f}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['db_queries_per_request']:>9.2f}"
+        )
+    print(f"\ncache hit ratio: {results['cache']['hit_ratio']}  (seeding took {results['seed_seconds']}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help=f"Weighted operations (default: {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=1234, help="Random seed for the request mix")
+    parser.add_argument("--output", type=Path, help="Where to write the JSON results (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir)
+        results = asyncio.run(benchmark(args))
+
+    output = args.output or Path("benchmarks/results") / f"{results['meta']['commit']}-{int(time.time())}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print_report(results)
+    print(f"results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Startup benchmark for the Blog API.
+
+Boots the app in fresh interpreters, the way a new worker starts, and times
+each phase: importing app.main, running the lifespan startup, and serving
+the first request. Everything runs offline, like benchmarks.run.
+
+    python -m benchmarks.startup --runs 20
+
+Results are written as JSON (see --output).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from benchmarks.run import configure_environment, git_commit, percentile
+
+PHASES = ("import", "startup", "first_request", "process")
+
+# Runs in the child interpreter; prints its phase timings as JSON
+CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def boot():
+    import httpx
+    from benchmarks.run import use_fake_redis
+    use_fake_redis()
+    before = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            (await client.get("/")).raise_for_status()
+        served = time.perf_counter()
+    return ready - before, served - ready
+
+startup, first_request = asyncio.run(boot())
+print(json.dumps({"import": imported - started, "startup": startup, "first_request": first_request}))
+"""
+
+def boot_once() -> dict:
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", CHILD], capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    # Interpreter start-up included: what scaling out actually waits for
+    timings["process"] = time.perf_counter() - started
+    return timings
+
+def summarize(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output", type=Path, help="Where to write the JSON results (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir)
+        os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))
+        # Schema first, as a deploy would; workers never create it
+        subprocess.run([sys.executable, "-m", "app.db.migrate"], check=True, capture_output=True)
+        runs = [boot_once() for _ in range(args.runs)]
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(UTC).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {"runs": args.runs},
+        },
+        "phases": {phase: summarize([run[phase] for run in runs]) for phase in PHASES},
+    }
+
+    output = args.output or Path("benchmarks/results") / f"startup-{results['meta']['commit']}-{int(time.time())}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    header = f"{'phase':<15}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for phase, row in results["phases"].items():
+        print(f"{phase:<15}{row['mean_ms']:>10.2f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['max_ms']:>10.2f}")
+    print(f"results written to {output}")
+
+if __name__ == "__main__":
+    main()
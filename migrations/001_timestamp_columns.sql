@@ -0,0 +1,39 @@
+-- Store post and user timestamps as timestamptz with database defaults,
+-- and index posts for newest-first keyset scans (PostgreSQL).
+--
+-- The old text values came from str(datetime.now()) and parse as
+-- timestamps; values without an offset are taken as UTC.
+BEGIN;
+
+SET LOCAL TIME ZONE 'UTC';
+
+ALTER TABLE posts
+    ALTER COLUMN created_at TYPE timestamptz USING created_at::timestamptz,
+    ALTER COLUMN created_at SET DEFAULT CURRENT_TIMESTAMP,
+    ALTER COLUMN updated_at TYPE timestamptz USING updated_at::timestamptz,
+    ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP;
+
+UPDATE posts SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+UPDATE posts SET updated_at = created_at WHERE updated_at IS NULL;
+
+ALTER TABLE posts
+    ALTER COLUMN created_at SET NOT NULL,
+    ALTER COLUMN updated_at SET NOT NULL;
+
+ALTER TABLE users
+    ALTER COLUMN created_at TYPE timestamptz USING created_at::timestamptz,
+    ALTER COLUMN created_at SET DEFAULT CURRENT_TIMESTAMP;
+
+UPDATE users SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+
+ALTER TABLE users ALTER COLUMN created_at SET NOT NULL;
+
+DROP INDEX IF EXISTS ix_posts_created_at_id;
+DROP INDEX IF EXISTS ix_posts_author_id_created_at_id;
+
+CREATE INDEX IF NOT EXISTS ix_posts_created_at_desc_id_desc
+    ON posts (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS ix_posts_author_id_created_at_desc_id_desc
+    ON posts (author_id, created_at DESC, id DESC);
+
+COMMIT;
@@ -0,0 +1,2 @@
+-- View counts, written back in batches from Redis (PostgreSQL).
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS view_count integer NOT NULL DEFAULT 0;
@@ -0,0 +1,8 @@
+-- Cache operations committed with each post write and applied to Redis
+-- afterwards (PostgreSQL).
+CREATE TABLE IF NOT EXISTS cache_outbox (
+    id serial PRIMARY KEY,
+    operations json NOT NULL,
+    attempts integer NOT NULL DEFAULT 0,
+    created_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
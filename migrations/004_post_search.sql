@@ -0,0 +1,18 @@
+-- Full-text search over posts: a weighted tsvector kept in a generated
+-- column and its GIN index (PostgreSQL). The same DDL as app/db/search.py
+-- runs when the posts table is created.
+--
+-- Adding a STORED generated column rewrites the table, which computes
+-- search_vector for every existing post; both statements hold an exclusive
+-- lock on posts until the index is built.
+BEGIN;
+
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(content, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector);
+
+COMMIT;
@@ -0,0 +1,13 @@
+#!/bin/bash
+set -e
+
+# Workers share their Prometheus metrics through files in this directory.
+# Leftovers from a previous run would be summed in again, so start empty
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+# Worker count comes from WEB_CONCURRENCY (default 1)
+# --frozen: use the environment the image synced, never re-resolve at boot
+exec uv run --frozen fastapi run "$@"
@@ -2,16 +2,22 @@ import pytest
 import os
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 
 from app.main import app
 from app.db.database import Base, get_db
 from app.models.user import User
+from app.cache import redis as cache
+from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.db.profiling import profile_engine
 
-# Use in-memory SQLite for tests
+# Use a file-backed SQLite database shared by the sync and async engines
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
 # Create test engine
 engine = create_engine(
@@ -20,8 +26,15 @@ engine = create_engine(
     poolclass=StaticPool,
 )
 
+# Each TestClient request runs on its own event loop, so never share
+# async connections between them
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+instrument_engine(async_engine, "primary")
+profile_engine(async_engine)
+
 # Create TestingSessionLocal
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_db():
@@ -33,23 +46,30 @@ def setup_test_db():
 
 @pytest.fixture(scope="function")
 def test_db():
-    connection = engine.connect()
-    transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+    session = TestingSessionLocal()
 
     yield session
 
     session.close()
-    transaction.rollback()
-    connection.close()
+    # The app commits through its own async sessions, so wipe the tables
+    # instead of rolling back a shared transaction
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+@pytest.fixture(scope="function")
+def clean_cache():
+    # Tables are wiped between tests, so cached rows must go with them
+    cache.redis_client.flushdb()
+    if cache.local_cache is not None:
+        cache.local_cache.clear()
+    yield cache
 
 @pytest.fixture(scope="function")
-def client(test_db):
-    def override_get_db():
-        try:
-            yield test_db
-        finally:
-            test_db.close()
+def client(test_db, clean_cache):
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
     
     app.dependency_overrides[get_db] = override_get_db
     yield TestClient(app)
@@ -85,6 +105,17 @@ def test_user_token(client, test_user):
     assert response.status_code == 200
     return response.json()["access_token"]
 
+@pytest.fixture(scope="function")
+def query_budget(monkeypatch):
+    """Returns a checker asserting a response ran at most `budget` SQL queries."""
+    monkeypatch.setattr(settings, "DB_QUERY_HEADERS", True)
+
+    def check(response, budget: int) -> int:
+        queries = int(response.headers["X-DB-Queries"])
+        assert queries <= budget, f"{response.request.url.path} ran {queries} queries, budget is {budget}"
+        return queries
+    return check
+
 @pytest.fixture(autouse=True)
 def setup_test_env():
     """Setup test environment variables."""
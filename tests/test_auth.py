@@ -1,27 +1,4 @@
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.main import app
-from app.db.database import Base, get_db
-from app.models.user import User
-
-# Setup test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base.metadata.create_all(bind=engine)
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-client = TestClient(app)
 
 def test_register(client):
     response = client.post(
@@ -126,4 +103,111 @@ def test_register_database_error(client, monkeypatch):
         }
     )
     assert response.status_code == 400
-    assert "Database error" in response.json()["detail"] 
\ No newline at end of file
+    assert "Database error" in response.json()["detail"] 
+
+def test_register_hashing_overloaded(client, monkeypatch):
+    """Test registration is shed with 503 when the hashing pool is saturated"""
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_PENDING", 0)
+
+    response = client.post(
+        "/api/auth/register",
+        json={
+            "email": "busy@example.com",
+            "username": "busyuser",
+            "password": "password123"
+        }
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_password_hash_async_roundtrip():
+    """Test the executor-backed hashing helpers"""
+    import asyncio
+    from app.core.security import get_password_hash_async, verify_password_async
+
+    async def roundtrip():
+        hashed = await get_password_hash_async("secret")
+        return (
+            await verify_password_async("secret", hashed),
+            await verify_password_async("wrong", hashed),
+        )
+
+    assert asyncio.run(roundtrip()) == (True, False)
+
+def test_login_rate_limited_per_account(client, test_user, query_budget, monkeypatch):
+    """Test repeated logins for one account get a 429 before any DB work"""
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_ACCOUNT", 2)
+    credentials = {"username": test_user["email"], "password": "wrongpassword"}
+
+    for _ in range(2):
+        assert client.post("/api/auth/login", data=credentials).status_code == 401
+
+    response = client.post("/api/auth/login", data=credentials)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert query_budget(response, 0) == 0
+
+    # Other accounts from the same address are unaffected
+    other = {"username": "someone@example.com", "password": "password"}
+    assert client.post("/api/auth/login", data=other).status_code == 401
+
+def test_login_rate_limited_per_ip(client, monkeypatch):
+    """Test one address cycling through accounts is limited too"""
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_IP", 3)
+    statuses = [
+        client.post("/api/auth/login", data={"username": f"user{i}@example.com", "password": "x"}).status_code
+        for i in range(4)
+    ]
+    assert statuses == [401, 401, 401, 429]
+
+def test_login_rate_limited_per_forwarded_ip(client, monkeypatch):
+    """Test clients behind a trusted proxy get a bucket each"""
+    from fastapi.testclient import TestClient
+    from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+    from app.core.config import settings
+    from app.main import app
+
+    monkeypatch.setattr(settings, "LOGIN_RATE_LIMIT_PER_IP", 2)
+    # What uvicorn does with FORWARDED_ALLOW_IPS set to the proxy's address
+    proxied = TestClient(ProxyHeadersMiddleware(app, trusted_hosts="testclient"))
+
+    def login(address):
+        headers = {"X-Forwarded-For": address}
+        return proxied.post("/api/auth/login", headers=headers, data={"username": "nobody@example.com", "password": "x"})
+
+    assert [login("203.0.113.1").status_code for _ in range(3)] == [401, 401, 429]
+    assert login("203.0.113.2").status_code == 401
+
+def test_register_rate_limited_per_ip(client, monkeypatch):
+    """Test registration bursts from one address are limited"""
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "REGISTER_RATE_LIMIT_PER_IP", 1)
+    user = {"email": "first@example.com", "username": "first", "password": "password123"}
+    assert client.post("/api/auth/register", json=user).status_code == 200
+
+    user = {"email": "second@example.com", "username": "second", "password": "password123"}
+    assert client.post("/api/auth/register", json=user).status_code == 429
+
+def test_take_tokens_refills(clean_cache, monkeypatch):
+    """Test the token bucket is all-or-nothing and refills over time"""
+    from app.cache import redis as cache
+
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    buckets = {"test:a": (2, 10), "test:b": (5, 10)}
+
+    assert cache.take_tokens(buckets) == 0
+    assert cache.take_tokens(buckets) == 0
+    # "a" is empty: nothing is taken from "b" either
+    assert cache.take_tokens(buckets) == 5
+    assert cache.take_tokens({"test:b": (5, 10)}) == 0
+
+    now[0] += 5
+    assert cache.take_tokens(buckets) == 0
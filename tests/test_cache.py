@@ -1,7 +1,12 @@
 import pytest
 from unittest.mock import Mock
 import json
-from app.cache.redis import get_cache, set_cache, invalidate_cache, invalidate_pattern
+import time
+from app.cache.local import LocalCache
+from app.cache.redis import (
+    get_cache, set_cache, invalidate_cache, invalidate_pattern,
+    get_generation, versioned_key, get_cache_stats, apply_cache_operations
+)
 
 def test_cache_operations(monkeypatch):
     """Test Redis cache operations with mocked Redis client"""
@@ -18,6 +23,9 @@ def test_cache_operations(monkeypatch):
         def delete(self, key):
             if key in cache_storage:
                 del cache_storage[key]
+
+        def publish(self, channel, message):
+            pass
                 
         def keys(self, pattern):
             # Simple pattern matching for test purposes
@@ -53,6 +61,151 @@ def test_cache_operations(monkeypatch):
     assert get_cache("pattern:1") is None
     assert get_cache("pattern:2") is None
 
+def test_generation_invalidation(monkeypatch):
+    """Test namespace generations with mocked Redis client"""
+    cache_storage = {}
+
+    class MockRedis:
+        def get(self, key):
+            return cache_storage.get(key)
+
+        def set(self, key, value, nx=False):
+            if nx and key in cache_storage:
+                return None
+            cache_storage[key] = str(value).encode()
+            return True
+
+        def setex(self, key, expiry, value):
+            cache_storage[key] = value
+
+        def incr(self, key):
+            value = int(cache_storage.get(key, 0)) + 1
+            cache_storage[key] = str(value).encode()
+            return value
+
+        def pipeline(self, transaction=True):
+            redis = self
+
+            class Pipeline:
+                def __init__(self):
+                    self.calls = []
+
+                def __getattr__(self, name):
+                    return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+                def execute(self):
+                    return [getattr(redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+            return Pipeline()
+
+        def publish(self, channel, message):
+            pass
+
+        def keys(self, pattern):
+            raise AssertionError("KEYS must not be used for generation invalidation")
+
+    monkeypatch.setattr("app.cache.redis.redis_client", MockRedis())
+    monkeypatch.setattr("app.cache.redis.local_cache", LocalCache(max_entries=10, ttl=60))
+    monkeypatch.setattr("app.cache.redis._generation_seed", lambda: 1000)
+
+    # A missing counter is seeded from the clock rather than starting at 0
+    assert get_generation("listing") == 1000
+    first_key = versioned_key("listing", "", 10)
+    assert first_key == "listing:1000::10"
+    set_cache(first_key, ["cached"])
+
+    # One bump hides every page built from the old generation
+    apply_cache_operations([["bump", "listing"]])
+    assert get_generation("listing") == 1001
+    second_key = versioned_key("listing", "", 10)
+    assert second_key != first_key
+    assert get_cache(second_key) is None
+
+def test_local_cache_lru_and_ttl():
+    """Test LRU eviction and TTL expiry of the in-process cache"""
+    cache = LocalCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+    cache.set("short", "value", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+
+def test_local_cache_serves_hot_keys(monkeypatch):
+    """Test that repeated reads are served without a Redis round-trip"""
+    calls = []
+
+    class MockRedis:
+        def get(self, key):
+            calls.append(key)
+            return json.dumps({"id": 7}).encode()
+
+        def delete(self, key):
+            pass
+
+        def publish(self, channel, message):
+            calls.append(("publish", channel))
+
+        def info(self, section):
+            return {"evicted_keys": 0}
+
+    monkeypatch.setattr("app.cache.redis.redis_client", MockRedis())
+    monkeypatch.setattr("app.cache.redis.local_cache", LocalCache(max_entries=10, ttl=60))
+
+    assert get_cache("hot:7") == {"id": 7}
+    assert get_cache("hot:7") == {"id": 7}
+    assert calls == ["hot:7"]
+    stats = get_cache_stats()
+    assert stats["local"]["hits"] == 1
+    assert stats["local"]["misses"] == 1
+
+    # Invalidation drops the local copy and tells the other workers
+    invalidate_cache("hot:7")
+    assert ("publish", "cache:invalidate") in calls
+    get_cache("hot:7")
+    assert calls.count("hot:7") == 2
+
+def test_invalidation_message_evicts_local_copy(monkeypatch):
+    """Test that broadcasts from other workers evict local copies"""
+    from app.cache import redis as cache_module
+
+    local = LocalCache(max_entries=10, ttl=60)
+    monkeypatch.setattr(cache_module, "local_cache", local)
+    local.set("post:1", {"id": 1})
+    local.set("user_posts:1:0::10", [])
+
+    cache_module._handle_invalidation({"data": json.dumps({"keys": ["post:1"]})})
+    assert local.get("post:1") is None
+
+    cache_module._handle_invalidation({"data": json.dumps({"pattern": "user_posts:1:*"})})
+    assert local.get("user_posts:1:0::10") is None
+
+def test_listing_invalidated_on_create(client, test_user_token):
+    """Test that creating a post invalidates cached listing pages"""
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+
+    # Warm the listing cache
+    first_response = client.get("/api/posts/")
+    assert first_response.status_code == 200
+    first_ids = [post["id"] for post in first_response.json()["items"]]
+
+    create_response = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={"title": "Fresh Post", "content": "Should show up immediately"}
+    )
+    assert create_response.status_code == 201
+    post_id = create_response.json()["id"]
+    assert post_id not in first_ids
+
+    second_response = client.get("/api/posts/")
+    assert post_id in [post["id"] for post in second_response.json()["items"]]
+
 def test_post_caching(client, test_user_token):
     """Test caching for post endpoints"""
     headers = {"Authorization": f"Bearer {test_user_token}"}
@@ -127,11 +280,163 @@ def test_user_posts_caching(client, test_user_token):
     assert first_data == second_data
     
     # Delete a post should invalidate user posts cache
-    post_id = first_data[0]["id"]
+    post_id = first_data["items"][-1]["id"]
     delete_response = client.delete(f"/api/posts/{post_id}", headers=headers)
     assert delete_response.status_code == 204
     
     # Next request should have updated data
     updated_response = client.get("/api/posts/me", headers=headers)
     assert updated_response.status_code == 200
-    assert len(updated_response.json()) == len(first_data) - 1 
\ No newline at end of file
+    assert len(updated_response.json()["items"]) == len(first_data["items"]) - 1 
+
+def test_cache_hit_skips_validation(client, test_user_token, monkeypatch):
+    """Test cache hits are served as stored bytes without pydantic work"""
+    from app.schemas.post import Post as PostSchema
+
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    post_id = client.post(
+        "/api/posts/", headers=headers, json={"title": "Raw Post", "content": "Raw bytes"}
+    ).json()["id"]
+
+    first_response = client.get(f"/api/posts/{post_id}")
+    assert first_response.status_code == 200
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cache hit must not validate")
+
+    monkeypatch.setattr(PostSchema, "model_validate", fail)
+    second_response = client.get(f"/api/posts/{post_id}")
+    assert second_response.status_code == 200
+    assert second_response.headers["content-type"] == "application/json"
+    assert second_response.content == first_response.content
+    assert second_response.json()["title"] == "Raw Post"
+
+def test_get_or_set_single_flight(clean_cache):
+    """Test concurrent misses run the loader only once"""
+    import asyncio
+    from app.cache.redis import get_or_set_raw
+
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return b"rebuilt"
+
+    async def stampede():
+        return await asyncio.gather(*(get_or_set_raw("stampede:1", loader) for _ in range(10)))
+
+    assert asyncio.run(stampede()) == [b"rebuilt"] * 10
+    assert len(calls) == 1
+
+def test_get_or_set_remembers_not_found(clean_cache):
+    """Test a 404 from the loader is shared with waiters and repeat callers"""
+    import asyncio
+    from fastapi import HTTPException
+    from app.cache.redis import get_many_cache_raw, get_or_set_raw
+
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    async def stampede():
+        return await asyncio.gather(*(get_or_set_raw("missing:1", loader) for _ in range(10)), return_exceptions=True)
+
+    results = asyncio.run(stampede())
+    assert [(error.status_code, error.detail) for error in results] == [(404, "Post not found")] * 10
+    assert len(calls) == 1
+
+    with pytest.raises(HTTPException):
+        asyncio.run(get_or_set_raw("missing:1", loader))
+    assert len(calls) == 1
+    # Batch reads treat the remembered 404 as not cached
+    assert get_many_cache_raw(["missing:1"]) == {}
+
+def test_get_or_set_stale_while_revalidate(clean_cache, monkeypatch):
+    """Test stale entries are served while another caller holds the rebuild lock"""
+    import asyncio
+    from app.cache.redis import get_or_set_raw, set_cache_raw
+
+    monkeypatch.setattr("app.cache.redis._jittered_ttl", lambda expiry: expiry)
+    set_cache_raw("swr:1", b"old", expiry=-1)  # already past its soft expiry
+
+    async def loader():
+        return b"new"
+
+    lock = clean_cache.redis_client.lock("lock:swr:1", timeout=5)
+    assert lock.acquire(blocking=False)
+    try:
+        assert asyncio.run(get_or_set_raw("swr:1", loader)) == b"old"
+    finally:
+        lock.release()
+
+    # With the lock free, the next caller refreshes the entry
+    assert asyncio.run(get_or_set_raw("swr:1", loader)) == b"new"
+
+def test_cache_ttl_jitter(monkeypatch):
+    """Test expiries are spread around the requested TTL"""
+    from app.cache.redis import _jittered_ttl
+
+    ttls = {_jittered_ttl(1000) for _ in range(50)}
+    assert all(900 <= ttl <= 1100 for ttl in ttls)
+    assert len(ttls) > 1
+
+def test_apply_cache_operations(clean_cache):
+    redis = clean_cache.redis_client
+    set_cache("post:1", {"title": "Stale"})
+    set_cache("post:2", {"title": "Kept"})
+    generation = get_generation("all_posts")
+
+    apply_cache_operations([
+        ["invalidate", "post:1"],
+        ["bump", "all_posts"],
+        ["index", 3, 1000],
+        ["invalidate", "post:1"],
+        ["bump", "all_posts"],
+    ])
+    assert get_cache("post:1") is None
+    assert get_cache("post:2") == {"title": "Kept"}
+    # Repeats within a batch collapse into one bump
+    assert get_generation("all_posts") == generation + 1
+    assert redis.zcard(clean_cache.RECENT_INDEX_KEY) == 1
+
+    apply_cache_operations([["unindex", 3]])
+    assert redis.zcard(clean_cache.RECENT_INDEX_KEY) == 0
+
+    with pytest.raises(ValueError):
+        apply_cache_operations([["explode", 1]])
+
+def test_warm_cache_preloads_posts_and_pages(client, test_user_token, clean_cache, query_budget):
+    import asyncio
+    from app.cache.redis import record_view
+    from app.db.warmup import warm_cache
+    from tests.conftest import TestingAsyncSessionLocal
+
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    posts = client.post(
+        "/api/posts/batch", headers=headers,
+        json=[{"title": f"Warm {i}", "content": "Preloaded"} for i in range(6)],
+    ).json()
+    oldest = min(post["id"] for post in posts)
+
+    # A Redis restart: nothing cached, no recent-posts index
+    clean_cache.redis_client.flushdb()
+    if clean_cache.local_cache is not None:
+        clean_cache.local_cache.clear()
+    record_view(oldest)
+
+    warmed = asyncio.run(warm_cache(TestingAsyncSessionLocal, pages=2, page_size=2, top=2, concurrency=2))
+    # The four posts on the warmed pages plus the most viewed one
+    assert warmed == {"posts": 5, "pages": 2}
+
+    first = client.get("/api/posts/", params={"limit": 2})
+    assert query_budget(first, 0) == 0
+    second = client.get("/api/posts/", params={"limit": 2, "cursor": first.json()["next_cursor"]})
+    assert query_budget(second, 0) == 0
+    assert query_budget(client.get(f"/api/posts/{oldest}"), 0) == 0
+
+    # Already warm: nothing is loaded twice
+    assert asyncio.run(warm_cache(TestingAsyncSessionLocal, pages=0, page_size=2, top=2, concurrency=2))["posts"] == 0
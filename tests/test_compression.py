@@ -0,0 +1,48 @@
+import pytest
+from app.core import compression
+from app.core.compression import negotiate_encoding
+
+def create_large_posts(client, token, count=40, size=2000):
+    headers = {"Authorization": f"Bearer {token}"}
+    posts = [{"title": f"Large {i}", "content": "lorem ipsum " * (size // 12)} for i in range(count)]
+    response = client.post("/api/posts/batch", headers=headers, json=posts)
+    assert response.status_code == 201
+
+def test_negotiate_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "ENCODINGS", ("br", "gzip"))
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("*") == "br"
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("") is None
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/api/posts/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_large_listing_is_compressed(client, test_user_token, encoding):
+    if encoding not in compression.ENCODINGS:
+        pytest.skip(f"{encoding} support is not installed")
+    create_large_posts(client, test_user_token)
+
+    plain = client.get("/api/posts/", params={"limit": 100}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert int(plain.headers["content-length"]) == len(plain.content)
+
+    response = client.get("/api/posts/", params={"limit": 100}, headers={"Accept-Encoding": encoding})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.num_bytes_downloaded) < len(plain.content) / 5
+    assert response.json() == plain.json()
+
+    # Compressed representations get a weak validator that still revalidates
+    etag = response.headers["etag"]
+    assert etag == "W/" + plain.headers["etag"]
+    response = client.get(
+        "/api/posts/", params={"limit": 100}, headers={"Accept-Encoding": encoding, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
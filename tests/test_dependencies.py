@@ -1,12 +1,14 @@
+import asyncio
 import pytest
 from fastapi import HTTPException
-from app.core.dependencies import get_current_user
+from app.cache.redis import get_cache
+from app.core.dependencies import get_current_user, principal_key
 from jose import jwt
 
 def test_get_current_user_invalid_token(client):
     """Test get_current_user with invalid token"""
     with pytest.raises(HTTPException) as exc_info:
-        next(get_current_user("invalid_token"))
+        asyncio.run(get_current_user("invalid_token"))
     assert exc_info.value.status_code == 401
     assert exc_info.value.detail == "Could not validate credentials"
 
@@ -23,5 +25,89 @@ def test_get_current_user_expired_token(client, test_user):
     expired_token = jwt.encode(token_data, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     
     with pytest.raises(HTTPException) as exc_info:
-        next(get_current_user(expired_token))
-    assert exc_info.value.status_code == 401 
\ No newline at end of file
+        asyncio.run(get_current_user(expired_token))
+    assert exc_info.value.status_code == 401 
+
+def test_get_current_user_uses_principal_cache(client, test_user_token):
+    """Test warm authenticated writes skip the user lookup query"""
+    from sqlalchemy import event
+    from tests.conftest import async_engine
+
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    # Warm the principal cache
+    assert client.get("/api/posts/me", headers=headers).status_code == 200
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = client.post(
+            "/api/posts/",
+            headers=headers,
+            json={"title": "Warm Post", "content": "No user lookup"}
+        )
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+    assert response.status_code == 201
+    assert not [s for s in statements if "FROM users" in s]
+
+def test_principal_cache_invalidated_on_deactivation(client, test_db, test_user_token):
+    """Test deactivating a user evicts the cached principal"""
+    from app.models.user import User
+
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    assert client.get("/api/posts/me", headers=headers).status_code == 200
+
+    user = test_db.query(User).filter(User.email == "test@example.com").first()
+    user.is_active = False
+    test_db.flush()
+    # Still cached until the change is committed
+    assert get_cache(principal_key("test@example.com"))["is_active"]
+    test_db.commit()
+
+    assert get_cache(principal_key("test@example.com")) is None
+    assert client.get("/api/posts/me", headers=headers).status_code == 401
+
+def test_principal_cache_invalidated_on_async_commit(client, test_user_token):
+    """Test an AsyncSession commit evicts the cached principal off the event loop"""
+    from unittest.mock import patch
+    from sqlalchemy import select
+    from app.core import dependencies
+    from app.models.user import User
+    from tests.conftest import TestingAsyncSessionLocal
+
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    assert client.get("/api/posts/me", headers=headers).status_code == 200
+
+    async def deactivate():
+        async with TestingAsyncSessionLocal() as db:
+            user = (await db.execute(select(User).where(User.email == "test@example.com"))).scalar_one()
+            user.is_active = False
+            with patch.object(dependencies, "run_in_threadpool", wraps=dependencies.run_in_threadpool) as threadpool:
+                await db.commit()
+                await asyncio.gather(*dependencies._evictions)
+        return threadpool.call_args.args
+
+    assert asyncio.run(deactivate()) == (dependencies.evict_principals, {"test@example.com"})
+    assert get_cache(principal_key("test@example.com")) is None
+    assert client.get("/api/posts/me", headers=headers).status_code == 401
+
+def test_principal_cache_kept_on_rollback(client, test_db, test_user_token):
+    """Test a rolled back change leaves the cached principal alone"""
+    from app.models.user import User
+
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    assert client.get("/api/posts/me", headers=headers).status_code == 200
+
+    user = test_db.query(User).filter(User.email == "test@example.com").first()
+    user.is_active = False
+    test_db.flush()
+    test_db.rollback()
+    test_db.commit()
+
+    assert get_cache(principal_key("test@example.com"))["is_active"]
+    assert client.get("/api/posts/me", headers=headers).status_code == 200
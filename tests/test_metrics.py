@@ -0,0 +1,64 @@
+from prometheus_client.parser import text_string_to_metric_families
+
+def get_samples(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    return [
+        sample
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    ]
+
+def test_metrics_request_latency_by_route(client):
+    client.get("/api/posts/12345")
+    samples = get_samples(client)
+
+    counts = [
+        sample for sample in samples
+        if sample.name == "http_request_duration_seconds_count"
+        and sample.labels["route"] == "/api/posts/{post_id}"
+        and sample.labels["status"] == "404"
+    ]
+    assert counts and counts[0].value >= 1
+
+    # Raw paths never become label values
+    assert not [s for s in samples if s.labels.get("route") == "/api/posts/12345"]
+
+def test_metrics_cache_and_db_counters(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    post_id = client.post(
+        "/api/posts/", headers=headers, json={"title": "Metrics", "content": "Counted"}
+    ).json()["id"]
+    client.get(f"/api/posts/{post_id}")
+    client.get(f"/api/posts/{post_id}")
+
+    samples = get_samples(client)
+    cache_hits = [
+        sample for sample in samples
+        if sample.name == "cache_requests_total" and sample.labels["result"] == "hit"
+    ]
+    assert sum(sample.value for sample in cache_hits) >= 1
+
+    db_queries = [
+        sample for sample in samples
+        if sample.name == "db_query_duration_seconds_count" and sample.labels["engine"] == "primary"
+    ]
+    assert db_queries and db_queries[0].value > 0
+
+    hashing = [s for s in samples if s.name == "password_hash_duration_seconds_count"]
+    assert hashing and sum(s.value for s in hashing) >= 2
+
+def test_worker_exit_marks_process_dead(monkeypatch):
+    import os
+    from app.core import metrics
+
+    dead = []
+    monkeypatch.setattr(metrics.multiprocess, "mark_process_dead", dead.append)
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    metrics.mark_worker_exited()
+    assert dead == []
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus")
+    metrics.mark_worker_exited()
+    assert dead == [os.getpid()]
@@ -20,7 +20,46 @@ def test_create_post(client, test_user_token):
 def test_read_posts(client):
     response = client.get("/api/posts/")
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
+    data = response.json()
+    assert isinstance(data["items"], list)
+    assert "next_cursor" in data
+
+def test_read_posts_cursor_pagination(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    created_ids = []
+    for i in range(5):
+        response = client.post(
+            "/api/posts/",
+            headers=headers,
+            json={"title": f"Page Post {i}", "content": f"Page content {i}"}
+        )
+        created_ids.append(response.json()["id"])
+
+    seen_ids = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/posts/me", headers=headers, params=params)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["items"]) <= 2
+        seen_ids.extend(post["id"] for post in data["items"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+
+    # Newest first, every post exactly once
+    assert seen_ids == sorted(created_ids, reverse=True)
+
+def test_read_posts_invalid_cursor(client):
+    response = client.get("/api/posts/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_read_posts_limit_bounds(client):
+    response = client.get("/api/posts/", params={"limit": 1000})
+    assert response.status_code == 422
 
 def test_read_post(client, test_user_token):
     # First create a post
@@ -192,4 +231,466 @@ def test_delete_post_not_owner(client, test_user_token):
 
 def test_get_nonexistent_post(client, test_user_token, monkeypatch):
     response = client.get("/api/posts/99999")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_nonexistent_post_lookup_is_cached(client, query_budget):
+    assert client.get("/api/posts/99998").status_code == 404
+    response = client.get("/api/posts/99998")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Post not found"}
+    query_budget(response, 0)
+
+def test_created_post_replaces_cached_not_found(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    first = client.post("/api/posts/", headers=headers, json={"title": "First", "content": "Content"}).json()
+    next_id = first["id"] + 1
+    assert client.get(f"/api/posts/{next_id}").status_code == 404
+
+    response = client.post("/api/posts/", headers=headers, json={"title": "Second", "content": "Content"})
+    assert response.json()["id"] == next_id
+    response = client.get(f"/api/posts/{next_id}")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Second"
+
+def test_search_posts(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    posts = [
+        ("Gardening tips", "Tomatoes need plenty of sun"),
+        ("Cooking pasta", "Add a tomato sauce and basil"),
+        ("Sunny afternoon", "Nothing about vegetables here"),
+    ]
+    ids = []
+    for title, content in posts:
+        response = client.post("/api/posts/", headers=headers, json={"title": title, "content": content})
+        ids.append(response.json()["id"])
+
+    response = client.get("/api/posts/search", params={"q": "pasta"})
+    assert response.status_code == 200
+    assert [post["id"] for post in response.json()["items"]] == [ids[1]]
+
+    # Title matches rank above body matches
+    client.post("/api/posts/", headers=headers, json={"title": "Basil", "content": "Grow it indoors"})
+    response = client.get("/api/posts/search", params={"q": "basil"})
+    titles = [post["title"] for post in response.json()["items"]]
+    assert titles == ["Basil", "Cooking pasta"]
+
+def test_search_posts_pagination(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    for i in range(3):
+        client.post("/api/posts/", headers=headers, json={"title": f"Searchable {i}", "content": "needle"})
+
+    first_page = client.get("/api/posts/search", params={"q": "needle", "limit": 2}).json()
+    assert len(first_page["items"]) == 2
+    second_page = client.get(
+        "/api/posts/search",
+        params={"q": "needle", "limit": 2, "cursor": first_page["next_cursor"]}
+    ).json()
+    assert len(second_page["items"]) == 1
+    assert second_page["next_cursor"] is None
+
+def test_search_index_follows_updates_and_deletes(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    post_id = client.post(
+        "/api/posts/", headers=headers, json={"title": "Walrus", "content": "Arctic animal"}
+    ).json()["id"]
+
+    client.put(f"/api/posts/{post_id}", headers=headers, json={"title": "Penguin"})
+    assert client.get("/api/posts/search", params={"q": "walrus"}).json()["items"] == []
+    assert len(client.get("/api/posts/search", params={"q": "penguin"}).json()["items"]) == 1
+
+    client.delete(f"/api/posts/{post_id}", headers=headers)
+    assert client.get("/api/posts/search", params={"q": "penguin"}).json()["items"] == []
+
+def test_search_posts_hostile_query(client):
+    response = client.get("/api/posts/search", params={"q": 'NEAR(" OR *'})
+    assert response.status_code == 200
+
+def test_create_posts_batch(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    payload = [{"title": f"Batch {i}", "content": f"Batch content {i}"} for i in range(3)]
+    response = client.post("/api/posts/batch", headers=headers, json=payload)
+    assert response.status_code == 201
+    data = response.json()
+    assert [post["title"] for post in data] == ["Batch 0", "Batch 1", "Batch 2"]
+    assert len({post["id"] for post in data}) == 3
+
+    # The listing cache was invalidated by the batch
+    listed = client.get("/api/posts/me", headers=headers).json()["items"]
+    assert {post["id"] for post in data} <= {post["id"] for post in listed}
+
+def test_create_posts_batch_limits(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    assert client.post("/api/posts/batch", headers=headers, json=[]).status_code == 422
+    too_many = [{"title": "t", "content": "c"}] * 101
+    assert client.post("/api/posts/batch", headers=headers, json=too_many).status_code == 422
+
+def test_read_posts_by_ids(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    payload = [{"title": f"Multi {i}", "content": "multi"} for i in range(3)]
+    ids = [post["id"] for post in client.post("/api/posts/batch", headers=headers, json=payload).json()]
+
+    # Warm the cache for one of them so the request mixes hits and misses
+    client.get(f"/api/posts/{ids[1]}")
+
+    requested = [ids[2], ids[0], 99999, ids[1]]
+    response = client.get("/api/posts/", params={"ids": ",".join(map(str, requested))})
+    assert response.status_code == 200
+    data = response.json()
+    assert [post["id"] for post in data["items"]] == [ids[2], ids[0], ids[1]]
+    assert data["next_cursor"] is None
+
+def test_read_posts_by_ids_invalid(client):
+    assert client.get("/api/posts/", params={"ids": "1,abc"}).status_code == 400
+    too_many = ",".join(str(i) for i in range(101))
+    assert client.get("/api/posts/", params={"ids": too_many}).status_code == 400
+
+def test_read_post_conditional_get(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    post_id = client.post(
+        "/api/posts/", headers=headers, json={"title": "Etag Post", "content": "Etag content"}
+    ).json()["id"]
+
+    response = client.get(f"/api/posts/{post_id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    response = client.get(f"/api/posts/{post_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    response = client.get(f"/api/posts/{post_id}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    client.put(f"/api/posts/{post_id}", headers=headers, json={"title": "Etag Post v2"})
+    response = client.get(f"/api/posts/{post_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["title"] == "Etag Post v2"
+
+def test_read_posts_conditional_get(client, test_user_token):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    response = client.get("/api/posts/", params={"limit": 5})
+    etag = response.headers["ETag"]
+
+    response = client.get("/api/posts/", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Other pages have their own validators
+    response = client.get("/api/posts/", params={"limit": 6}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+    client.post("/api/posts/", headers=headers, json={"title": "New", "content": "Changes the listing"})
+    response = client.get("/api/posts/", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_post_endpoint_query_budgets(client, test_user_token, query_budget):
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    response = client.post("/api/posts/", headers=headers, json={"title": "Budget", "content": "Counted"})
+    query_budget(response, 3)
+    post_id = response.json()["id"]
+
+    assert query_budget(client.get(f"/api/posts/{post_id}"), 1) == 1
+    assert query_budget(client.get(f"/api/posts/{post_id}"), 0) == 0
+    query_budget(client.get("/api/posts/", params={"limit": 20}), 1)
+    query_budget(client.get("/api/posts/me", headers=headers), 2)
+    query_budget(client.get("/api/posts/", params={"ids": f"{post_id},999"}), 1)
+
+    response = client.post(
+        "/api/posts/batch", headers=headers,
+        json=[{"title": f"Batch {i}", "content": "Counted"} for i in range(10)],
+    )
+    # PostgreSQL runs one INSERT for the whole batch. SQLite cannot return rows
+    # in parameter order from one statement, so there it inserts row by row
+    query_budget(response, 3 + 10)
+    assert [post["title"] for post in response.json()] == [f"Batch {i}" for i in range(10)]
+    assert float(response.headers["X-DB-Time"]) >= 0
+
+def test_post_timestamps(client, test_user_token):
+    from datetime import datetime
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    first = client.post("/api/posts/", headers=headers, json={"title": "First", "content": "One"}).json()
+    second = client.post("/api/posts/", headers=headers, json={"title": "Second", "content": "Two"}).json()
+
+    # Set per row by the database, returned as UTC
+    created = datetime.fromisoformat(first["created_at"])
+    assert created.utcoffset().total_seconds() == 0
+    assert datetime.fromisoformat(second["created_at"]) > created
+
+    updated = client.put(f"/api/posts/{first['id']}", headers=headers, json={"title": "First v2"}).json()
+    assert updated["created_at"] == first["created_at"]
+    assert datetime.fromisoformat(updated["updated_at"]) > datetime.fromisoformat(first["updated_at"])
+
+def test_listings_are_index_ordered(test_db):
+    from sqlalchemy import select, text
+    from app.models.post import Post
+
+    listings = [
+        select(Post).order_by(Post.created_at.desc(), Post.id.desc()).limit(20),
+        select(Post).where(Post.author_id == 1).order_by(Post.created_at.desc(), Post.id.desc()).limit(20),
+    ]
+    for query in listings:
+        compiled = query.compile(test_db.bind, compile_kwargs={"literal_binds": True})
+        plan = " ".join(row[-1] for row in test_db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+        assert "USING INDEX ix_posts_" in plan
+        assert "TEMP B-TREE" not in plan
+
+def test_export_posts_ndjson(client, test_user, test_user_token):
+    import json
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    client.post(
+        "/api/posts/batch", headers=headers,
+        json=[{"title": f"Export {i}", "content": f"Exported {i}"} for i in range(5)],
+    )
+
+    response = client.get("/api/posts/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    posts = [json.loads(line) for line in response.text.splitlines()]
+    assert [post["title"] for post in posts] == [f"Export {i}" for i in range(5)]
+
+    response = client.get("/api/posts/export", params={"author_id": test_user["id"] + 1})
+    assert response.text == ""
+    response = client.get("/api/posts/export", params={"created_after": posts[0]["created_at"]})
+    assert len(response.text.splitlines()) == 5
+    response = client.get("/api/posts/export", params={"created_before": posts[0]["created_at"]})
+    assert response.text == ""
+
+def test_import_posts_ndjson(client, test_user_token, query_budget, monkeypatch):
+    import json
+    from app.api import posts
+    monkeypatch.setattr(posts, "IMPORT_BATCH_SIZE", 10)
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+
+    body = "".join(json.dumps({"title": f"Imported {i}", "content": "Backfilled"}) + "\n" for i in range(25))
+    response = client.post("/api/posts/import", headers=headers, content=body.encode())
+    assert response.status_code == 200
+    assert response.json() == {"imported": 25}
+    # Three batched INSERTs, not one per line, each with its outbox row
+    assert query_budget(response, 7) <= 7
+    assert client.get("/api/posts/me", headers=headers, params={"limit": 100}).json()["items"][0]["title"] == "Imported 24"
+
+    # An export round-trips through the import
+    exported = client.get("/api/posts/export").content
+    response = client.post("/api/posts/import", headers=headers, content=exported)
+    assert response.json() == {"imported": 25}
+
+    response = client.post("/api/posts/import", headers=headers, content=b'{"title": "Ok", "content": "Ok"}\n{"title": 1}\n')
+    assert response.status_code == 422
+    assert "line 2" in response.json()["detail"]
+
+    response = client.post("/api/posts/import", content=body.encode())
+    assert response.status_code == 401
+
+def test_view_counts_written_back(client, test_user_token, test_db):
+    import asyncio
+    from datetime import datetime, UTC
+    from app.db.view_counts import flush_view_counts
+    from app.models.post import Post
+    from app.schemas.types import as_utc
+    from tests.conftest import TestingAsyncSessionLocal
+
+    async def flush():
+        async with TestingAsyncSessionLocal() as db:
+            return await flush_view_counts(db)
+
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    quiet_id = client.post("/api/posts/", headers=headers, json={"title": "Quiet", "content": "Few views"}).json()["id"]
+    busy_id = client.post("/api/posts/", headers=headers, json={"title": "Busy", "content": "Many views"}).json()["id"]
+
+    client.get(f"/api/posts/{quiet_id}")
+    for _ in range(3):
+        # Cache hits and revalidations count too
+        etag = client.get(f"/api/posts/{busy_id}").headers["ETag"]
+    client.get(f"/api/posts/{busy_id}", headers={"If-None-Match": etag})
+
+    popular = client.get("/api/posts/popular", params={"limit": 5}).json()["items"]
+    assert [post["id"] for post in popular] == [busy_id, quiet_id]
+
+    # Backdated, so a flush that touched updated_at could not go unnoticed
+    edited = datetime(2020, 1, 1, tzinfo=UTC)
+    test_db.query(Post).filter(Post.id.in_([quiet_id, busy_id])).update({Post.updated_at: edited})
+    test_db.commit()
+
+    assert asyncio.run(flush()) == 2
+    assert asyncio.run(flush()) == 0
+    counts = dict(test_db.query(Post.id, Post.view_count).filter(Post.id.in_([quiet_id, busy_id])))
+    assert counts == {quiet_id: 1, busy_id: 4}
+    test_db.expire_all()
+    assert {as_utc(test_db.get(Post, post_id).updated_at) for post_id in (quiet_id, busy_id)} == {edited}
+
+    client.get(f"/api/posts/{busy_id}")
+    asyncio.run(flush())
+    test_db.expire_all()
+    assert test_db.get(Post, busy_id).view_count == 5
+
+    client.delete(f"/api/posts/{busy_id}", headers=headers)
+    popular = client.get("/api/posts/popular").json()["items"]
+    assert [post["id"] for post in popular] == [quiet_id]
+
+def test_view_flush_failure_keeps_deltas(client, test_user_token, clean_cache):
+    import asyncio
+    from app.cache.redis import pending_view_deltas
+
+    async def take(fail=False):
+        async with pending_view_deltas() as deltas:
+            if fail:
+                raise RuntimeError("database down")
+            return deltas
+
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    post_id = client.post("/api/posts/", headers=headers, json={"title": "Kept", "content": "Views"}).json()["id"]
+    client.get(f"/api/posts/{post_id}")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(take(fail=True))
+
+    # Views counted meanwhile wait for the next batch
+    client.get(f"/api/posts/{post_id}")
+    assert asyncio.run(take()) == {post_id: 1}
+    assert asyncio.run(take()) == {post_id: 1}
+    assert asyncio.run(take()) == {}
+
+def test_recent_posts_index(client, test_user_token, clean_cache, query_budget):
+    import asyncio
+    from app.db.recent_posts import rebuild_recent_index
+    from tests.conftest import TestingAsyncSessionLocal
+
+    async def rebuild():
+        async with TestingAsyncSessionLocal() as db:
+            return await rebuild_recent_index(db)
+
+    def walk(limit=2):
+        pages, cursor = [], None
+        while True:
+            params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/api/posts/", params=params)
+            pages.append(response)
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                return pages
+
+    def ids(pages):
+        return [post["id"] for page in pages for post in page.json()["items"]]
+
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    client.post("/api/posts/", headers=headers, json={"title": "Single", "content": "Alone"})
+    # Rows inserted together share created_at and are ordered by id
+    client.post("/api/posts/batch", headers=headers, json=[{"title": f"Batch {i}", "content": "Tied"} for i in range(5)])
+    client.post("/api/posts/import", headers=headers, content=b'{"title": "Imported", "content": "Line"}\n')
+
+    from_database = walk()
+    expected = ids(from_database)
+    assert len(expected) == 7 and expected == sorted(expected, reverse=True)
+
+    assert asyncio.run(rebuild()) == 7
+    from_index = walk()
+    assert ids(from_index) == expected
+    # Bodies now come from the per-post cache: no SQL at all
+    assert all(query_budget(page, 0) == 0 for page in walk())
+    # Cursors are interchangeable between the two paths
+    cursor = from_database[0].json()["next_cursor"]
+    assert client.get("/api/posts/", params={"limit": 2, "cursor": cursor}).json() == from_index[1].json()
+
+    new_id = client.post("/api/posts/", headers=headers, json={"title": "Newest", "content": "Top"}).json()["id"]
+    client.delete(f"/api/posts/{expected[0]}", headers=headers)
+    assert ids(walk(limit=3)) == [new_id, *expected[1:]]
+
+    # Without the index, listings go back to the database
+    client.delete(f"/api/posts/{expected[1]}", headers=headers)
+    clean_cache.redis_client.delete(clean_cache.RECENT_READY_KEY)
+    pages = walk()
+    assert ids(pages) == [new_id, *expected[2:]]
+    assert int(pages[0].headers["X-DB-Queries"]) > 0
+
+def test_cache_outbox_survives_redis_errors(client, test_user_token, clean_cache, test_db, monkeypatch):
+    import asyncio
+    from redis import RedisError
+    from app.db import outbox
+    from app.models.outbox import CacheOutbox
+    from tests.conftest import TestingAsyncSessionLocal
+
+    async def dispatch():
+        async with TestingAsyncSessionLocal() as db:
+            return await outbox.dispatch_outbox(db)
+
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    post_id = client.post("/api/posts/", headers=headers, json={"title": "Before", "content": "Cached"}).json()["id"]
+    # Applied right after the response
+    assert test_db.query(CacheOutbox).count() == 0
+    assert client.get(f"/api/posts/{post_id}").json()["title"] == "Before"
+
+    def redis_down(operations):
+        raise RedisError("connection refused")
+
+    monkeypatch.setattr(outbox, "apply_cache_operations", redis_down)
+    response = client.put(f"/api/posts/{post_id}", headers=headers, json={"title": "After"})
+    # The write itself succeeds; only the invalidation waits
+    assert response.status_code == 200
+    queued = test_db.query(CacheOutbox).one()
+    assert queued.attempts == 1
+    assert ["invalidate", f"post:{post_id}"] in queued.operations
+    assert client.get(f"/api/posts/{post_id}").json()["title"] == "Before"
+
+    monkeypatch.undo()
+    assert asyncio.run(dispatch()) == 1
+    test_db.expire_all()
+    assert test_db.query(CacheOutbox).count() == 0
+    assert client.get(f"/api/posts/{post_id}").json()["title"] == "After"
+
+def test_writes_visible_before_outbox_dispatch(client, test_user_token, test_db, monkeypatch):
+    from app.api import posts
+    from app.models.outbox import CacheOutbox
+
+    async def dispatch_later(db):
+        return 0
+
+    # Leave every outbox row queued, as if the background dispatch had not run yet
+    monkeypatch.setattr(posts, "dispatch_outbox", dispatch_later)
+    headers = {"Authorization": f"Bearer {test_user_token}"}
+    post_id = client.post("/api/posts/", headers=headers, json={"title": "First", "content": "Cached"}).json()["id"]
+    assert [post["id"] for post in client.get("/api/posts/").json()["items"]] == [post_id]
+    assert client.get("/api/posts/me", headers=headers).json()["items"][0]["title"] == "First"
+    assert client.get(f"/api/posts/{post_id}").json()["title"] == "First"
+
+    new_id = client.post("/api/posts/", headers=headers, json={"title": "Second", "content": "New"}).json()["id"]
+    client.put(f"/api/posts/{post_id}", headers=headers, json={"title": "Edited"})
+    assert [post["id"] for post in client.get("/api/posts/").json()["items"]] == [new_id, post_id]
+    assert client.get("/api/posts/me", headers=headers).json()["items"][1]["title"] == "Edited"
+    assert client.get(f"/api/posts/{post_id}").json()["title"] == "Edited"
+
+    client.delete(f"/api/posts/{new_id}", headers=headers)
+    assert [post["id"] for post in client.get("/api/posts/").json()["items"]] == [post_id]
+    assert test_db.query(CacheOutbox).count() == 4
+
+def test_cache_outbox_dispatch_is_serialized(client, test_user_token, clean_cache, test_db):
+    import asyncio
+    from app.db.outbox import dispatch_outbox
+    from app.models.outbox import CacheOutbox
+    from tests.conftest import TestingAsyncSessionLocal
+
+    async def dispatch():
+        async with TestingAsyncSessionLocal() as db:
+            return await dispatch_outbox(db)
+
+    test_db.add_all([
+        CacheOutbox(operations=[["index", 7, 1000]]),
+        CacheOutbox(operations=[["no_such_action"]]),
+        CacheOutbox(operations=[["unindex", 7]]),
+    ])
+    test_db.commit()
+
+    # Another worker is dispatching; the rows wait for it
+    lock = clean_cache.redis_client.lock("lock:outbox", timeout=5)
+    assert lock.acquire(blocking=False)
+    assert asyncio.run(dispatch()) == 0
+    lock.release()
+    assert test_db.query(CacheOutbox).count() == 3
+
+    # The malformed entry is dropped instead of blocking the ones behind it
+    assert asyncio.run(dispatch()) == 3
+    test_db.expire_all()
+    assert test_db.query(CacheOutbox).count() == 0
+    assert clean_cache.redis_client.zscore(clean_cache.RECENT_INDEX_KEY, f"{7:019d}") is None